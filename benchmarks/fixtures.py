@@ -0,0 +1,83 @@
+"""
+fixtures.py - Synthetic inputs for the benchmarks, scaled beyond the real data.
+
+Everything is generated from a fixed seed, so a fixture is identical between
+commits and benchmark timings stay comparable. Ridings keep the real
+FED_NUM layout (province code * 1000 + number) and province codes, so the
+regional code paths see realistic groupings.
+"""
+
+import numpy as np
+import pandas as pd
+
+from forecast_engine import PARTIES, Baseline
+from polls import PollTable
+from regions import PROVINCE_REGIONS
+
+# Number of ridings and parties in the bundled 2025 data
+REAL_RIDINGS = 343
+REAL_PARTIES = len(PARTIES)
+
+FIXTURE_SEED = 2025
+
+# Riding number prefix of each province code, as in the FED_NUMs
+PROVINCE_PREFIXES = {
+    'NL': 10, 'PEI': 11, 'NS': 12, 'NB': 13, 'QC': 24, 'ON': 35, 'MB': 46,
+    'SK': 47, 'AB': 48, 'BC': 59, 'YT': 60, 'NW': 61, 'NU': 62,
+}
+
+
+def synthetic_baseline(num_ridings=10 * REAL_RIDINGS, num_parties=10, seed=FIXTURE_SEED):
+    """Baseline of `num_ridings` ridings and `num_parties` parties, about 10% of cells uncontested."""
+    rng = np.random.default_rng(seed)
+    provinces = np.array(list(PROVINCE_REGIONS))[rng.integers(0, len(PROVINCE_REGIONS), num_ridings)]
+    provinces.sort()
+    prefixes = np.array([PROVINCE_PREFIXES[p] for p in provinces.tolist()])
+    riding_ids = prefixes * 10000 + np.arange(num_ridings)
+
+    present = rng.random((num_ridings, num_parties)) > 0.1
+    present[:, :2] = True
+    shares = rng.dirichlet(np.linspace(3, 0.5, num_parties), num_ridings) * 100 * present
+    national = shares.mean(axis=0)
+    return Baseline(riding_ids, shares, present, national, provinces)
+
+
+def synthetic_poll_averages(baseline, seed=FIXTURE_SEED):
+    """(P,) poll averages a few points away from the baseline's national shares, and a margin of error."""
+    rng = np.random.default_rng(seed)
+    averages = np.round(np.maximum(baseline.national + rng.normal(0, 2, baseline.num_parties), 0.5), 1)
+    return averages, 2.5
+
+
+def synthetic_polls(num_polls, start='2025-05-01', days=480, seed=FIXTURE_SEED):
+    """National PollTable (as from load_polls()) of `num_polls` polls spread over `days` days."""
+    rng = np.random.default_rng(seed)
+    lastdate = np.datetime64(start) + np.sort(rng.integers(0, days, num_polls))
+    values = rng.dirichlet(np.linspace(3, 0.5, len(PARTIES)), num_polls) * 100
+    polls = pd.DataFrame(np.round(values, 1), columns=PARTIES)
+    polls['error'] = np.round(rng.uniform(1.5, 4.0, num_polls), 1)
+    polls['sample'] = rng.integers(800, 3000, num_polls)
+    polls['lastdate'] = pd.Series(lastdate).dt.strftime('%Y-%m-%d')
+    polls['region'] = 'National'
+    return PollTable.from_frame(polls)
+
+
+def scale_riding_frame(frame, id_column, factor):
+    """Repeat a per-riding results frame `factor` times with new, unique riding ids."""
+    frames = []
+    for k in range(factor):
+        copy = frame.copy()
+        copy[id_column] = copy[id_column].astype(int) + k * 1000000
+        frames.append(copy)
+    return pd.concat(frames, ignore_index=True)
+
+
+def synthetic_districts(riding_ids, seed=FIXTURE_SEED):
+    """GeoDataFrame of one small square per riding, standing in for the district boundaries file."""
+    import geopandas as gpd
+    from shapely.geometry import box
+
+    rng = np.random.default_rng(seed)
+    corners = rng.uniform([-140, 42], [-52, 70], (len(riding_ids), 2))
+    geometry = [box(x, y, x + 0.5, y + 0.5) for x, y in corners]
+    return gpd.GeoDataFrame({'FED_NUM': np.asarray(riding_ids).astype(str)}, geometry=geometry, crs='EPSG:4326')
@@ -0,0 +1,354 @@
+"""
+run_benchmarks.py - Time and memory benchmarks for the model's hot paths.
+
+    python benchmarks/run_benchmarks.py                          # every case
+    python benchmarks/run_benchmarks.py run_10k aggregate_10x    # some cases
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/OLD.json benchmarks/results/NEW.json
+
+Everything runs offline against the bundled election_database.db, plus
+synthetic fixtures (fixtures.py) scaled to 10x the ridings and 10 parties
+(cases ending in _10x). Each case runs in its own child process, so its peak
+RSS (the process high-water mark, which includes imports and the case
+setup) is measured in isolation; setup_rss_mb is the peak before the timed
+calls start. Both come from instrumentation.max_rss_mb() and are null where
+the platform cannot report them.
+
+Results are written to benchmarks/results/<time>-<commit>.json; compare two
+result files to spot regressions between commits.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / 'election_model'))
+sys.path.insert(0, str(PROJECT_ROOT / 'election_map'))
+
+from baseline_cache import load_or_build
+from baselines import CurrentYearBaseline
+from forecast_engine import RunningAggregates, chunk_size_for_budget, run_simulations, simulate_batch
+from forecast_model import DB_PATH, ForecastModel, export_csv
+from instrumentation import max_rss_mb
+from polls import load_polls, poll_averages
+
+import fixtures
+
+RESULTS_DIR = PROJECT_ROOT / 'benchmarks' / 'results'
+
+DEFAULT_REPEAT = 5
+
+# Ratio of median times above which --compare flags a case as slower
+REGRESSION_THRESHOLD = 1.10
+
+# Memory budget for the chunks of the 10x runs
+SCALED_BUDGET_MB = 256
+
+
+# Scratch directory of the case running in this process (see run_case())
+_scratch = None
+
+
+def _scratch_dir():
+    """A new directory for a case's files, removed with the case's scratch directory."""
+    return tempfile.mkdtemp(dir=_scratch)
+
+
+def _round_mb(value):
+    return None if value is None else round(value, 1)
+
+
+def _format_mb(value, width):
+    return f"{'-':>{width}s}" if value is None else f"{value:>{width}.1f}"
+
+
+# ── Cases ────────────────────────────────────────────────────────────────────
+#
+# Each case's setup returns (callable to time, number of items it processes).
+
+def _model():
+    return ForecastModel.load('current', use_cache=False)
+
+
+def _as_of(polls):
+    """The date of the last bundled poll, so every case forecasts a date with polls."""
+    return polls.lastdate.max().astype(date)
+
+
+def _run_result(model, n_sims=10000):
+    return model.run(n_sims, seed=1, as_of_date=_as_of(model.polls))
+
+
+def setup_baseline_build():
+    conn = sqlite3.connect(DB_PATH)
+    strategy = CurrentYearBaseline()
+    return lambda: strategy.build(conn), fixtures.REAL_RIDINGS
+
+
+def setup_baseline_cache_load():
+    conn = sqlite3.connect(DB_PATH)
+    strategy = CurrentYearBaseline()
+    cache_dir = _scratch_dir()
+    load_or_build(conn, strategy, cache_dir)
+    return lambda: load_or_build(conn, strategy, cache_dir), fixtures.REAL_RIDINGS
+
+
+def setup_poll_weighting():
+    conn = sqlite3.connect(DB_PATH)
+    polls = load_polls(conn)
+    as_of = _as_of(polls)
+    return lambda: poll_averages(polls, as_of), len(polls)
+
+
+def _date_range(polls, days=365):
+    end = polls.lastdate.max()
+    return np.arange(end - days + 1, end + 1)
+
+
+def setup_poll_weighting_365d():
+    polls = load_polls(sqlite3.connect(DB_PATH))
+    dates = _date_range(polls)
+    return lambda: poll_averages(polls, dates), len(dates)
+
+
+def setup_poll_weighting_365d_10x():
+    polls = fixtures.synthetic_polls(10 * len(load_polls(sqlite3.connect(DB_PATH))))
+    dates = _date_range(polls)
+    return lambda: poll_averages(polls, dates), len(dates)
+
+
+def setup_simulate_election():
+    model = _model()
+    as_of = _as_of(model.polls)
+    rng = np.random.default_rng(1)
+    return lambda: model.simulate_election(as_of, rng), 1
+
+
+def setup_run_1k():
+    model = _model()
+    return lambda: _run_result(model, 1000), 1000
+
+
+def setup_run_10k():
+    model = _model()
+    return lambda: _run_result(model, 10000), 10000
+
+
+def setup_run_2k_10x():
+    baseline = fixtures.synthetic_baseline()
+    averages, margin_of_error = fixtures.synthetic_poll_averages(baseline)
+    chunk_size = chunk_size_for_budget(baseline, SCALED_BUDGET_MB)
+    return lambda: run_simulations(baseline, averages, margin_of_error, 2000, chunk_size, seed=1), 2000
+
+
+def _aggregate_case(baseline, averages, margin_of_error, numsims=1000):
+    seats, winners, shares = simulate_batch(baseline, averages, margin_of_error, numsims, np.random.default_rng(1))
+
+    def aggregate():
+        RunningAggregates(baseline).add(seats, winners, shares)
+    return aggregate, numsims
+
+
+def setup_aggregate():
+    model = _model()
+    averages, margin_of_error = model.poll_inputs(_as_of(model.polls))
+    return _aggregate_case(model.baseline, averages, margin_of_error)
+
+
+def setup_aggregate_10x():
+    baseline = fixtures.synthetic_baseline()
+    return _aggregate_case(baseline, *fixtures.synthetic_poll_averages(baseline), numsims=250)
+
+
+def setup_csv_export():
+    result = _run_result(_model())
+    path = _scratch_dir()
+    return lambda: export_csv(result, path), result.numsims
+
+
+def _geojson_frames(factor=1):
+    """(ridingvotepercents, ridingprobabilities) frames as create_geojson.py reads them."""
+    result = _run_result(_model(), 2000)
+    path = Path(_scratch_dir())
+    export_csv(result, path)
+    from create_geojson import load_forecast
+    df_election, df_win_probs = load_forecast(path)
+    if factor > 1:
+        df_election = fixtures.scale_riding_frame(df_election, 'DISTRICTID', factor)
+        df_win_probs = fixtures.scale_riding_frame(df_win_probs, 'FED_NUM', factor)
+    return df_election, df_win_probs
+
+
+def _colour_case(factor):
+    from create_geojson import colour_ridings
+    _, df_win_probs = _geojson_frames(factor)
+    return lambda: colour_ridings(df_win_probs.copy()), len(df_win_probs)
+
+
+def _merge_case(factor):
+    from create_geojson import colour_ridings, merge_forecast
+    df_election, df_win_probs = _geojson_frames(factor)
+    df_win_probs = colour_ridings(df_win_probs)
+    gdf = fixtures.synthetic_districts(df_win_probs['FED_NUM'])
+    return lambda: merge_forecast(gdf.copy(), df_election.copy(), df_win_probs.copy()), len(gdf)
+
+
+CASES = {
+    'baseline_build': (setup_baseline_build, 'build the 2025 riding baseline from the database'),
+    'baseline_cache_load': (setup_baseline_cache_load, 'load the baseline from a warm .npz cache'),
+    'poll_weighting': (setup_poll_weighting, 'national poll averages for one date'),
+    'poll_weighting_365d': (setup_poll_weighting_365d, 'national poll averages for 365 dates'),
+    'poll_weighting_365d_10x': (setup_poll_weighting_365d_10x, 'poll averages for 365 dates, 10x the polls'),
+    'simulate_election': (setup_simulate_election, 'one simulated election'),
+    'run_1k': (setup_run_1k, 'ForecastModel.run, 1,000 simulations'),
+    'run_10k': (setup_run_10k, 'ForecastModel.run, 10,000 simulations'),
+    'run_2k_10x': (setup_run_2k_10x, '2,000 simulations, 10x ridings and 10 parties'),
+    'aggregate': (setup_aggregate, 'fold 1,000 simulations into the running aggregates'),
+    'aggregate_10x': (setup_aggregate_10x, 'fold 250 simulations, 10x ridings and 10 parties'),
+    'csv_export': (setup_csv_export, 'export_csv of a 10,000 simulation run'),
+    'geojson_colour': (lambda: _colour_case(1), 'create_geojson winner, margin and fill colour'),
+    'geojson_colour_10x': (lambda: _colour_case(10), 'create_geojson colouring, 10x ridings'),
+    'geojson_merge': (lambda: _merge_case(1), 'create_geojson merge onto riding shapes'),
+    'geojson_merge_10x': (lambda: _merge_case(10), 'create_geojson merge, 10x ridings'),
+}
+
+
+def run_case(name, repeat):
+    """Set up and time one case in this process; returns its result dict.
+
+    Files the case writes go to a temporary directory that is removed afterwards.
+    """
+    global _scratch
+    setup, description = CASES[name]
+    with tempfile.TemporaryDirectory(prefix='benchmark-') as _scratch:
+        func, items = setup()
+        setup_rss = max_rss_mb()
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+    _scratch = None
+    median = float(np.median(times))
+    return {
+        'description': description,
+        'items': items,
+        'repeat': repeat,
+        'times_s': [round(t, 6) for t in times],
+        'median_s': round(median, 6),
+        'min_s': round(min(times), 6),
+        'items_per_s': round(items / median, 1) if median > 0 else None,
+        'setup_rss_mb': _round_mb(setup_rss),
+        'peak_rss_mb': _round_mb(max_rss_mb()),
+    }
+
+
+def run_in_child(name, repeat):
+    """Run one case in a fresh interpreter, so its peak RSS is its own."""
+    proc = subprocess.run([sys.executable, __file__, '--child', name, '--repeat', str(repeat)],
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {'description': CASES[name][1], 'error': proc.stderr.strip().splitlines()[-1:]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def git_commit():
+    """(short commit hash, whether the tree has uncommitted changes), or (None, None) outside git."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=PROJECT_ROOT,
+                                capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, bool(status.strip())
+
+
+def environment():
+    commit, dirty = git_commit()
+    return {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'dirty': dirty,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpu_count': len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count(),
+    }
+
+
+def compare(base_path, new_path, threshold=REGRESSION_THRESHOLD):
+    """Print the median time and peak RSS of every case in both result files; returns the slower cases."""
+    base = json.loads(Path(base_path).read_text())
+    new = json.loads(Path(new_path).read_text())
+    print(f"{'case':<26s} {'base s':>10s} {'new s':>10s} {'ratio':>7s} {'base MB':>9s} {'new MB':>9s}")
+    slower = []
+    for name, result in new['cases'].items():
+        before = base['cases'].get(name)
+        if before is None or 'median_s' not in before or 'median_s' not in result:
+            print(f"{name:<26s} {'-':>10s} {result.get('median_s', 'error')!s:>10s}")
+            continue
+        ratio = result['median_s'] / before['median_s'] if before['median_s'] else float('nan')
+        flag = '  slower' if ratio > threshold else ''
+        if flag:
+            slower.append(name)
+        print(f"{name:<26s} {before['median_s']:>10.4f} {result['median_s']:>10.4f} {ratio:>7.2f}"
+              f" {_format_mb(before['peak_rss_mb'], 9)} {_format_mb(result['peak_rss_mb'], 9)}{flag}")
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the election model hot paths')
+    parser.add_argument('cases', nargs='*', help=f'cases to run (default all: {", ".join(CASES)})')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='timed calls per case')
+    parser.add_argument('--output', type=Path, default=None,
+                        help='result file (default benchmarks/results/<time>-<commit>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), type=Path, default=None,
+                        help='compare two result files instead of running')
+    parser.add_argument('--child', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(run_case(args.child, args.repeat)))
+        return
+    if args.compare:
+        slower = compare(*args.compare)
+        raise SystemExit(1 if slower else 0)
+
+    unknown = set(args.cases) - set(CASES)
+    if unknown:
+        raise SystemExit(f"Unknown cases: {', '.join(sorted(unknown))}")
+
+    report = environment()
+    report['cases'] = {}
+    for name in args.cases or CASES:
+        result = run_in_child(name, args.repeat)
+        report['cases'][name] = result
+        if 'error' in result:
+            print(f"{name:<26s} failed: {' '.join(result['error'])}")
+        else:
+            print(f"{name:<26s} {result['median_s']:>10.4f} s  {_format_mb(result['peak_rss_mb'], 8)} MB peak")
+
+    output = args.output
+    if output is None:
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = RESULTS_DIR / f"{stamp}-{report['commit'] or 'nogit'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=1))
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
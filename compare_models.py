@@ -1,45 +1,136 @@
-import pandas as pd
+"""
+compare_models.py - Compare seat and riding projections between model variants.
+
+Default (common random numbers): simulates the baseline variants in one
+process on the same error draws and reports paired differences with their
+paired standard errors:
+    python compare_models.py --variants current weighted --sims 2000 --seed 1
+
+--csv DIR: compares saved outputs of two separate runs instead
+(seatstats_original.csv / seatstats_weighted.csv and the matching
+ridingvotepercents files in DIR).
+"""
+
+import argparse
+import sys
+from datetime import date
+from pathlib import Path
+
 import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).parent
+sys.path.insert(0, str(PROJECT_ROOT / 'election_model'))
+
+from comparison import compare_baselines, independent_se_ratio
+from error_models import ERROR_MODELS, get_error_model
+from forecast_engine import PARTIES
+from forecast_model import ForecastModel
+
+
+def compare_csv(base):
+    orig = pd.read_csv(base / 'seatstats_original.csv')
+    wgt  = pd.read_csv(base / 'seatstats_weighted.csv')
+    orig.index = PARTIES
+    wgt.index  = PARTIES
+
+    print('=== SEAT PROJECTIONS: MEAN (original vs weighted) ===')
+    for party in PARTIES:
+        o = orig.loc[party, 'mean']
+        w = wgt.loc[party, 'mean']
+        print(f'  {party.upper():<4s}  original={o:.1f}  weighted={w:.1f}  diff={w-o:+.1f}')
+
+    print()
+    print('=== SEAT RANGE (min / mean / max) ===')
+    header = f'{"Party":<6s} {"orig_min":>8s} {"orig_mean":>9s} {"orig_max":>8s}    {"wgt_min":>8s} {"wgt_mean":>9s} {"wgt_max":>8s}'
+    print(header)
+    for party in PARTIES:
+        print(
+            f'{party.upper():<6s}'
+            f' {orig.loc[party,"min"]:>8.0f}'
+            f' {orig.loc[party,"mean"]:>9.1f}'
+            f' {orig.loc[party,"max"]:>8.0f}'
+            f'    {wgt.loc[party,"min"]:>8.0f}'
+            f' {wgt.loc[party,"mean"]:>9.1f}'
+            f' {wgt.loc[party,"max"]:>8.0f}'
+        )
+
+    rorig = pd.read_csv(base / 'ridingvotepercents_original.csv', index_col=0)
+    rwgt  = pd.read_csv(base / 'ridingvotepercents_weighted.csv', index_col=0)
+
+    parties = [p for p in ['lpc','cpc','ndp','gpc','bq'] if p in rorig.columns and p in rwgt.columns]
+    rdiff = rwgt[parties] - rorig[parties]
+
+    print()
+    print('=== BIGGEST RIDING SHIFTS (weighted vs original, top 15 by max abs change) ===')
+    abs_max = rdiff.abs().max(axis=1).nlargest(15)
+    for rid in abs_max.index:
+        row = rdiff.loc[rid]
+        bp = row.abs().idxmax()
+        parts = '  '.join(f'{p.upper()}{row[p]:+.1f}' for p in parties)
+        print(f'  FED_NUM {rid}   biggest: {bp.upper()} {row[bp]:+.1f}pp   [{parts}]')
+
+
+def compare_crn(variants, sims, seed, as_of, top, error_model=None):
+    models = [ForecastModel.load(v) for v in variants]
+    averages, margin_of_error = models[0].poll_inputs(as_of)
+    baselines = [m.baseline for m in models]
+    aggregates, differences = compare_baselines(baselines, averages, margin_of_error, sims, seed=seed,
+                                               error_model=get_error_model(error_model))
+
+    ref_name = variants[0]
+    riding_ids = baselines[0].riding_ids
+    print(f'Common random numbers: {sims} simulations, reference = {ref_name}')
+
+    for name, agg, diff in zip(variants[1:], aggregates[1:], differences):
+        ref = aggregates[0]
+        print()
+        print(f'=== SEAT PROJECTIONS: MEAN ({ref_name} vs {name}, paired diff ± SE) ===')
+        seat_diff, seat_se = diff.seat_mean(), diff.seat_se()
+        for j, party in enumerate(PARTIES):
+            o = ref.seat_sum[j] / ref.numsims
+            w = agg.seat_sum[j] / agg.numsims
+            print(f'  {party.upper():<4s}  {ref_name}={o:.1f}  {name}={w:.1f}  diff={seat_diff[j]:+.2f} ± {seat_se[j]:.2f}')
+
+        win_diff, win_se = diff.win_prob_mean(), diff.win_prob_se()
+        print()
+        print(f'=== BIGGEST RIDING WIN PROBABILITY SHIFTS ({name} vs {ref_name}, top {top}) ===')
+        biggest = np.argsort(-np.nanmax(np.abs(win_diff), axis=1))[:top]
+        for r in biggest:
+            j = int(np.nanargmax(np.abs(win_diff[r])))
+            print(f'  FED_NUM {riding_ids[r]}   {PARTIES[j].upper()} {win_diff[r, j]:+.1f}pp ± {win_se[r, j]:.1f}')
+        print(f'  Paired SE is {independent_se_ratio(ref, agg, diff):.1f}x smaller than independent runs (median)')
+
+        share_diff, share_se = diff.vote_share_mean(), diff.vote_share_se()
+        print()
+        print(f'=== BIGGEST RIDING VOTE SHARE SHIFTS ({name} vs {ref_name}, top {top}) ===')
+        biggest = np.argsort(-np.nan_to_num(np.nanmax(np.abs(share_diff), axis=1)))[:top]
+        for r in biggest:
+            moving = np.isfinite(share_diff[r])
+            parts = '  '.join(f'{PARTIES[j].upper()}{share_diff[r, j]:+.1f}' for j in np.flatnonzero(moving))
+            j = int(np.nanargmax(np.abs(share_diff[r])))
+            print(f'  FED_NUM {riding_ids[r]}   biggest: {PARTIES[j].upper()} {share_diff[r, j]:+.1f}pp '
+                  f'± {share_se[r, j]:.2f}   [{parts}]')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare model variants')
+    parser.add_argument('--variants', nargs='+', default=['current', 'weighted'],
+                        help='baseline strategies to compare; the first is the reference')
+    parser.add_argument('--sims', type=int, default=2000, help='number of common-random-number simulations')
+    parser.add_argument('--seed', type=int, default=None, help='seed for reproducible comparisons')
+    parser.add_argument('--as-of', type=date.fromisoformat, default=None, help='poll date (YYYY-MM-DD, default today)')
+    parser.add_argument('--top', type=int, default=15, help='number of riding shifts to list')
+    parser.add_argument('--error-model', choices=sorted(ERROR_MODELS), default='independent',
+                        help='polling error model shared by the variants')
+    parser.add_argument('--csv', type=Path, default=None, help='compare saved CSV outputs in this directory instead')
+    args = parser.parse_args()
+
+    if args.csv is not None:
+        compare_csv(args.csv)
+    else:
+        compare_crn(args.variants, args.sims, args.seed, args.as_of, args.top, args.error_model)
+
 
-BASE = 'c:/GitHub/Donovan/election_forecast/model_results/'
-
-orig = pd.read_csv(BASE + 'seatstats_original.csv')
-wgt  = pd.read_csv(BASE + 'seatstats_weighted.csv')
-orig.index = ['lpc','cpc','ndp','gpc','bq','ppc']
-wgt.index  = ['lpc','cpc','ndp','gpc','bq','ppc']
-
-print('=== SEAT PROJECTIONS: MEAN (original vs weighted) ===')
-for party in ['lpc','cpc','ndp','gpc','bq','ppc']:
-    o = orig.loc[party, 'mean']
-    w = wgt.loc[party, 'mean']
-    print(f'  {party.upper():<4s}  original={o:.1f}  weighted={w:.1f}  diff={w-o:+.1f}')
-
-print()
-print('=== SEAT RANGE (min / mean / max) ===')
-header = f'{"Party":<6s} {"orig_min":>8s} {"orig_mean":>9s} {"orig_max":>8s}    {"wgt_min":>8s} {"wgt_mean":>9s} {"wgt_max":>8s}'
-print(header)
-for party in ['lpc','cpc','ndp','gpc','bq','ppc']:
-    print(
-        f'{party.upper():<6s}'
-        f' {orig.loc[party,"min"]:>8.0f}'
-        f' {orig.loc[party,"mean"]:>9.1f}'
-        f' {orig.loc[party,"max"]:>8.0f}'
-        f'    {wgt.loc[party,"min"]:>8.0f}'
-        f' {wgt.loc[party,"mean"]:>9.1f}'
-        f' {wgt.loc[party,"max"]:>8.0f}'
-    )
-
-rorig = pd.read_csv(BASE + 'ridingvotepercents_original.csv', index_col=0)
-rwgt  = pd.read_csv(BASE + 'ridingvotepercents_weighted.csv', index_col=0)
-
-parties = [p for p in ['lpc','cpc','ndp','gpc','bq'] if p in rorig.columns and p in rwgt.columns]
-rdiff = rwgt[parties] - rorig[parties]
-
-print()
-print('=== BIGGEST RIDING SHIFTS (weighted vs original, top 15 by max abs change) ===')
-abs_max = rdiff.abs().max(axis=1).nlargest(15)
-for rid in abs_max.index:
-    row = rdiff.loc[rid]
-    bp = row.abs().idxmax()
-    parts = '  '.join(f'{p.upper()}{row[p]:+.1f}' for p in parties)
-    print(f'  FED_NUM {rid}   biggest: {bp.upper()} {row[bp]:+.1f}pp   [{parts}]')
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+index_db.py - Step 4: typed polls table, keys, indexes and poll deduplication.
+
+1. Rebuilds polls with typed columns and UNIQUE (region, firm, lastdate, sample),
+   keeping the first copy of every duplicated poll
+2. Rebuilds ridings with id as its INTEGER PRIMARY KEY
+3. Adds indexes on riding_results (year, id) and polls (region, lastdate)
+
+A poll is identified by its region, firm, end date and sample size: the
+history has firms releasing two different polls for one region on one day
+(e.g. EKOS online and IVR samples), which only the sample size separates.
+The UNIQUE constraint lets scrape_polls.py insert with ON CONFLICT DO NOTHING
+instead of loading every existing poll to dedupe.
+
+Run from the project root:
+    .venv/Scripts/python.exe election_database/index_db.py
+
+A timestamped backup is written before any changes are made.
+Idempotent: each step checks whether it is needed before executing.
+"""
+
+import sqlite3
+import shutil
+from datetime import datetime
+
+DB_PATH = 'election_database/election_database.db'
+
+POLLS_SCHEMA = """
+    CREATE TABLE {name} (
+        region      TEXT NOT NULL,
+        lastdate    TEXT NOT NULL,
+        firm        TEXT NOT NULL,
+        method      TEXT,
+        sample      INTEGER,
+        error       REAL,
+        lpc         REAL,
+        cpc         REAL,
+        ndp         REAL,
+        gpc         REAL,
+        bq          REAL,
+        ppc         REAL,
+        UNIQUE (region, firm, lastdate, sample)
+    )
+"""
+
+RIDINGS_SCHEMA = """
+    CREATE TABLE {name} (
+        id                  INTEGER PRIMARY KEY,
+        province            TEXT,
+        riding_name         TEXT,
+        redistricting_year  INTEGER
+    )
+"""
+
+POLL_COLUMNS = "region, lastdate, firm, method, sample, error, lpc, cpc, ndp, gpc, bq, ppc"
+
+
+def backup(db_path):
+    ts = datetime.now().strftime('%Y%m%d_%H%M%S')
+    dest = db_path.replace('.db', f'_backup_{ts}.db')
+    shutil.copy2(db_path, dest)
+    print(f"Backup written to {dest}")
+
+
+def table_sql(c, name):
+    row = c.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (name,)).fetchone()
+    return row[0] if row else ''
+
+
+def main():
+    backup(DB_PATH)
+
+    conn = sqlite3.connect(DB_PATH)
+    c = conn.cursor()
+
+    # Rebuild polls with types and the poll identity constraint
+    if 'UNIQUE' not in table_sql(c, 'polls'):
+        before = c.execute("SELECT COUNT(*) FROM polls").fetchone()[0]
+        c.execute(POLLS_SCHEMA.format(name='polls_new'))
+        # Keep the first copy (lowest rowid) of each poll, in the original order
+        c.execute(f"""
+            INSERT INTO polls_new ({POLL_COLUMNS})
+            SELECT {POLL_COLUMNS} FROM polls
+            WHERE rowid IN (SELECT MIN(rowid) FROM polls GROUP BY region, firm, lastdate, sample)
+            ORDER BY rowid
+        """)
+        after = c.rowcount
+        c.execute("DROP TABLE polls")
+        c.execute("ALTER TABLE polls_new RENAME TO polls")
+        print(f"Rebuilt polls with typed columns: {after} polls kept, {before - after} duplicates removed")
+    else:
+        print("Skip: polls already typed and constrained")
+
+    # Rebuild ridings with a primary key
+    ridings_pk = [r[1] for r in c.execute("PRAGMA table_info(ridings)").fetchall() if r[5]]
+    if ridings_pk != ['id']:
+        c.execute(RIDINGS_SCHEMA.format(name='ridings_new'))
+        c.execute("""
+            INSERT INTO ridings_new (id, province, riding_name, redistricting_year)
+            SELECT id, province, riding_name, redistricting_year FROM ridings ORDER BY id
+        """)
+        c.execute("DROP TABLE ridings")
+        c.execute("ALTER TABLE ridings_new RENAME TO ridings")
+        print(f"Rebuilt ridings with PRIMARY KEY (id): {c.execute('SELECT COUNT(*) FROM ridings').fetchone()[0]} rows")
+    else:
+        print("Skip: ridings already keyed on id")
+
+    # Indexes for the model's lookups
+    for name, ddl in [
+        ('idx_riding_results_year_id', "CREATE INDEX idx_riding_results_year_id ON riding_results (year, id)"),
+        ('idx_polls_region_lastdate', "CREATE INDEX idx_polls_region_lastdate ON polls (region, lastdate)"),
+    ]:
+        if c.execute("SELECT 1 FROM sqlite_master WHERE type='index' AND name=?", (name,)).fetchone():
+            print(f"Skip: {name} already exists")
+        else:
+            c.execute(ddl)
+            print(f"Created {name}")
+
+    conn.commit()
+    c.execute("ANALYZE")
+    conn.commit()
+
+    # Verify
+    print("\nQuery plans:")
+    for query in [
+        "SELECT t1.id, t1.party, t1.votepercent FROM riding_results AS t1 "
+        "JOIN ridings AS t2 ON t1.id = t2.id WHERE t1.year = 2025",
+        "SELECT * FROM polls WHERE region = 'National'",
+    ]:
+        plan = [r[3] for r in c.execute(f"EXPLAIN QUERY PLAN {query}").fetchall()]
+        print(f"  {query[:60]}...\n    {'; '.join(plan)}")
+
+    conn.execute("VACUUM")
+    conn.close()
+    print("\nIndexing complete.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+normalize_polls.py - Step 5: clean, typed poll values with NULL for "not reported".
+
+1. Sets blank ('' or whitespace) sample, error and party values to NULL
+2. Converts numbers stored as text to INTEGER (sample) or REAL (the rest)
+3. Checks every lastdate is an ISO date (YYYY-MM-DD)
+4. Rebuilds polls with CHECK constraints so only typed values (or NULL) and
+   ISO dates can be inserted from now on
+
+The old tables mixed '' and NULL for values a pollster did not report, and the
+model turned '' into 0, averaging in zeros for parties that were simply not
+asked about. After this step polls.load_polls() reads the table as it is, and
+averages each party over the polls that reported it.
+
+Run from the project root, after index_db.py:
+    .venv/Scripts/python.exe election_database/normalize_polls.py
+
+A timestamped backup is written before any changes are made.
+Idempotent: each step checks whether it is needed before executing.
+"""
+
+import sqlite3
+import shutil
+from datetime import datetime
+
+DB_PATH = 'election_database/election_database.db'
+
+VALUE_COLUMNS = ['sample', 'error', 'lpc', 'cpc', 'ndp', 'gpc', 'bq', 'ppc']
+
+POLL_COLUMNS = "region, lastdate, firm, method, sample, error, lpc, cpc, ndp, gpc, bq, ppc"
+
+POLLS_SCHEMA = """
+    CREATE TABLE {name} (
+        region      TEXT NOT NULL,
+        lastdate    TEXT NOT NULL CHECK (lastdate = date(lastdate)),
+        firm        TEXT NOT NULL,
+        method      TEXT,
+        sample      INTEGER CHECK (sample IS NULL OR typeof(sample) = 'integer'),
+        error       REAL CHECK (error IS NULL OR typeof(error) = 'real'),
+        lpc         REAL CHECK (lpc IS NULL OR typeof(lpc) = 'real'),
+        cpc         REAL CHECK (cpc IS NULL OR typeof(cpc) = 'real'),
+        ndp         REAL CHECK (ndp IS NULL OR typeof(ndp) = 'real'),
+        gpc         REAL CHECK (gpc IS NULL OR typeof(gpc) = 'real'),
+        bq          REAL CHECK (bq IS NULL OR typeof(bq) = 'real'),
+        ppc         REAL CHECK (ppc IS NULL OR typeof(ppc) = 'real'),
+        UNIQUE (region, firm, lastdate, sample)
+    )
+"""
+
+
+def backup(db_path):
+    ts = datetime.now().strftime('%Y%m%d_%H%M%S')
+    dest = db_path.replace('.db', f'_backup_{ts}.db')
+    shutil.copy2(db_path, dest)
+    print(f"Backup written to {dest}")
+
+
+def table_sql(c, name):
+    row = c.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (name,)).fetchone()
+    return row[0] if row else ''
+
+
+def main():
+    backup(DB_PATH)
+
+    conn = sqlite3.connect(DB_PATH)
+    c = conn.cursor()
+
+    # Blanks -> NULL
+    for col in VALUE_COLUMNS:
+        c.execute(f"UPDATE polls SET {col} = NULL WHERE typeof({col}) = 'text' AND trim({col}) = ''")
+        if c.rowcount:
+            print(f"Set {c.rowcount} blank {col} values to NULL")
+
+    # Numbers stored as text -> numbers
+    for col in VALUE_COLUMNS:
+        bad = c.execute(f"""
+            SELECT rowid, {col} FROM polls
+            WHERE typeof({col}) = 'text' AND trim({col}) GLOB '*[^0-9.]*'
+        """).fetchall()
+        if bad:
+            raise ValueError(f"Non-numeric {col} values, fix by hand first: {bad[:10]}")
+        cast = 'INTEGER' if col == 'sample' else 'REAL'
+        c.execute(f"UPDATE polls SET {col} = CAST(trim({col}) AS {cast}) WHERE typeof({col}) = 'text'")
+        if c.rowcount:
+            print(f"Converted {c.rowcount} text {col} values to {cast}")
+
+    # Dates must already be ISO; anything else needs a look by hand
+    bad = c.execute("SELECT rowid, lastdate FROM polls WHERE date(lastdate) IS NOT lastdate").fetchall()
+    if bad:
+        raise ValueError(f"lastdate values that are not ISO dates: {bad[:10]}")
+
+    # Rebuild with CHECK constraints
+    if 'CHECK' not in table_sql(c, 'polls'):
+        c.execute(POLLS_SCHEMA.format(name='polls_new'))
+        c.execute(f"INSERT INTO polls_new ({POLL_COLUMNS}) SELECT {POLL_COLUMNS} FROM polls ORDER BY rowid")
+        c.execute("DROP TABLE polls")
+        c.execute("ALTER TABLE polls_new RENAME TO polls")
+        c.execute("CREATE INDEX idx_polls_region_lastdate ON polls (region, lastdate)")
+        print(f"Rebuilt polls with type checks: {c.execute('SELECT COUNT(*) FROM polls').fetchone()[0]} rows")
+    else:
+        print("Skip: polls already has type checks")
+
+    conn.commit()
+    c.execute("ANALYZE")
+    conn.commit()
+
+    # Verify
+    print("\nValue types:")
+    for col in VALUE_COLUMNS:
+        types = c.execute(f"SELECT typeof({col}), COUNT(*) FROM polls GROUP BY 1 ORDER BY 1").fetchall()
+        print(f"  {col:<8} {', '.join(f'{t} {n}' for t, n in types)}")
+
+    conn.execute("VACUUM")
+    conn.close()
+    print("\nNormalization complete.")
+
+
+if __name__ == '__main__':
+    main()
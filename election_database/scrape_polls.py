@@ -1,28 +1,51 @@
 """
-scrape_polls.py - Scrapes national polling data from 338canada.com/polls.htm
-and inserts new polls into the polls table.
+scrape_polls.py - Scrapes national and regional polling data from
+338canada.com/polls.htm and inserts new polls into the polls table.
 
-Designed to run daily as part of the automated pipeline. Checks existing
-(firm, lastdate) pairs before inserting so re-runs are safe.
+The page's demopoll_TABLE_DATA object holds one table per region ("demo");
+every region in REGION_ALIASES is parsed from the one download and inserted
+under its polls.region name. Each region's columns are matched to parties by
+their background colour, since regional tables need not share the national
+column order (e.g. BQ appears only where it runs).
+
+Designed to run daily as part of the automated pipeline. Polls are inserted
+with ON CONFLICT DO NOTHING against the table's UNIQUE (region, firm, lastdate,
+sample) constraint (see index_db.py), so re-runs are safe.
+
+Most days the page has not changed. The scraper keeps the page's ETag and
+Last-Modified and a hash of the poll data in the scrape_state table, sends
+If-None-Match / If-Modified-Since, and stops early when the server answers
+304 or the poll data hashes the same as last time. The run then finishes with
+status "unchanged" in its run report and writes nothing to the database.
 
 Run from the project root:
-    .venv/Scripts/python.exe election_database/scrape_polls.py
+    .venv/Scripts/python.exe election_database/scrape_polls.py [--url URL] [--force]
 """
 
+import argparse
+import hashlib
 import json
 import math
-import re
+import os
 import sqlite3
 import sys
+from datetime import date, datetime, timezone
 from pathlib import Path
 
 import requests
 
 PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / 'election_model'))
+
+from instrumentation import RunReport, detail, stage
+
 DB_PATH = PROJECT_ROOT / 'election_database' / 'election_database.db'
-URL = "https://338canada.com/polls.htm"
+URL = os.environ.get("POLLS_URL", "https://338canada.com/polls.htm")
+
+# The page assigns the poll table to this JS variable as a JSON object literal
+DATA_MARKER = "window.demopoll_TABLE_DATA"
 
-# Fixed cell order on 338Canada: LPC, CPC, NDP, GPC, BQ
+# National cell order on 338Canada: LPC, CPC, NDP, GPC, BQ
 # Validated against background colours: #d90000, #e2e2ff, #ffeac4, #ddf7dd, #e7f8ff
 CELL_ORDER = ["lpc", "cpc", "ndp", "gpc", "bq"]
 
@@ -35,35 +58,109 @@ EXPECTED_COLORS = {
     4: "#e7f8ff",  # BQ cyan
 }
 
+# Background colour -> party, for reading each region's own column order
+COLOR_PARTIES = {colour: CELL_ORDER[idx] for idx, colour in EXPECTED_COLORS.items()}
+
+# 338Canada demo name -> polls.region. The names already in the table are
+# kept so new regional polls continue the existing series (regions.py maps
+# them to model regions); demos not listed here (e.g. age groups) are skipped.
+REGION_ALIASES = {
+    "National": "National",
+    "Atlantic": "Atlantic Canada",
+    "Atlantic Canada": "Atlantic Canada",
+    "Quebec": "Québec",
+    "Québec": "Québec",
+    "Ontario": "Ontario",
+    "Prairies": "MB/SK",
+    "Manitoba/Saskatchewan": "MB/SK",
+    "MB/SK": "MB/SK",
+    "Alberta": "Alberta",
+    "British Columbia": "BC/CB",
+    "BC": "BC/CB",
+    "BC/CB": "BC/CB",
+}
 
-def fetch_raw_poll_rows():
-    """Fetch the page and extract the national poll rows from the JS data object."""
-    r = requests.get(URL, headers={"User-Agent": "Mozilla/5.0"}, timeout=30)
-    r.raise_for_status()
+STATE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS scrape_state (
+        url             TEXT PRIMARY KEY,
+        etag            TEXT,
+        last_modified   TEXT,
+        payload_sha256  TEXT,
+        fetched         TEXT
+    )
+"""
 
-    match = re.search(
-        r"window\.demopoll_TABLE_DATA\s*=\s*(\{.*?\});\s*\n",
-        r.text,
-        re.DOTALL,
+
+def load_state(conn, url):
+    """The validators and payload hash saved by the last run that found new data at `url`."""
+    row = conn.execute(
+        "SELECT etag, last_modified, payload_sha256 FROM scrape_state WHERE url = ?", (url,)
+    ).fetchone()
+    return dict(zip(("etag", "last_modified", "payload_sha256"), row)) if row else {}
+
+
+def save_state(conn, url, response, payload_sha256):
+    conn.execute(
+        """
+        INSERT INTO scrape_state (url, etag, last_modified, payload_sha256, fetched)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (url) DO UPDATE SET
+            etag = excluded.etag, last_modified = excluded.last_modified,
+            payload_sha256 = excluded.payload_sha256, fetched = excluded.fetched
+        """,
+        (url, response.headers.get("ETag"), response.headers.get("Last-Modified"),
+         payload_sha256, datetime.now(timezone.utc).isoformat(timespec="seconds")),
     )
-    if not match:
+
+
+def fetch_page(url, state):
+    """GET the page, conditional on the saved validators; None if the server says it is unchanged."""
+    headers = {"User-Agent": "Mozilla/5.0"}
+    if state.get("etag"):
+        headers["If-None-Match"] = state["etag"]
+    if state.get("last_modified"):
+        headers["If-Modified-Since"] = state["last_modified"]
+    r = requests.get(url, headers=headers, timeout=30)
+    if r.status_code == 304:
+        return None
+    r.raise_for_status()
+    return r
+
+
+def extract_table_data(html):
+    """The demopoll_TABLE_DATA JSON text and its decoded object.
+
+    Decodes from the opening brace with JSONDecoder.raw_decode, which stops at
+    the end of the object, rather than matching the whole page with a regex.
+    """
+    marker = html.find(DATA_MARKER)
+    start = html.find("{", marker + len(DATA_MARKER)) if marker >= 0 else -1
+    if start < 0:
         raise ValueError(
             "demopoll_TABLE_DATA not found — page structure may have changed"
         )
+    data, end = json.JSONDecoder().raw_decode(html, start)
+    return html[start:end], data
 
-    data = json.loads(match.group(1))
-    return data["demos"]["National"]["rows"]
 
+def cell_parties(region, row):
+    """Party of each cell in a region's table, from the first row's background colours.
 
-def validate_cell_order(row):
-    """Check the first row's cell colours match expectations. Warns if the page layout changed."""
+    Warns about any colour that is not a known party's, as the page layout may
+    have changed; if no colour is recognised at all, falls back to CELL_ORDER.
+    """
+    parties = []
     for idx, cell in enumerate(row["cells"]):
-        expected = EXPECTED_COLORS.get(idx)
-        if expected and cell["background"] != expected:
+        party = COLOR_PARTIES.get(cell.get("background"))
+        if party is None:
             print(
-                f"WARNING: Cell {idx} background is {cell['background']!r}, "
-                f"expected {expected!r}. Party order may have changed — review scraper."
+                f"WARNING: {region} cell {idx} background is {cell.get('background')!r}, "
+                f"not a known party colour. Party order may have changed — review scraper."
             )
+        parties.append(party)
+    if not any(parties):
+        return CELL_ORDER
+    return parties
 
 
 def parse_sample(sample_str):
@@ -75,21 +172,21 @@ def calc_moe(sample):
     return round(1.96 / math.sqrt(sample) * 100, 1)
 
 
-def parse_row(row):
+def parse_row(row, region, parties):
     sample = parse_sample(row["sample"])
     cells = row["cells"]
 
     shares = {}
-    for idx, party in enumerate(CELL_ORDER):
-        if idx < len(cells):
+    for idx, party in enumerate(parties):
+        if party and idx < len(cells):
             try:
                 shares[party] = float(cells[idx]["label"])
             except (ValueError, KeyError):
                 shares[party] = None
 
     return {
-        "region": "National",
-        "lastdate": row["date"],
+        "region": region,
+        "lastdate": date.fromisoformat(row["date"]).isoformat(),
         "firm": row["firm"],
         "method": None,       # not provided by 338Canada
         "sample": sample,
@@ -103,63 +200,121 @@ def parse_row(row):
     }
 
 
-def main():
-    print(f"Fetching polls from {URL} ...")
-    raw_rows = fetch_raw_poll_rows()
-    print(f"Found {len(raw_rows)} national polls on page")
-
-    # Validate cell order on first row
-    if raw_rows:
-        validate_cell_order(raw_rows[0])
+def parse_demos(demos):
+    """Polls of every known region in the page data.
 
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-
-    existing = set(
-        c.execute("SELECT firm, lastdate FROM polls").fetchall()
-    )
-    print(f"Existing polls in DB: {len(existing)}")
-
-    inserted = 0
+    Returns (polls, {region: rows found}, skipped election rows, rows that failed to parse).
+    """
+    polls = []
+    found = {}
     skipped = 0
     errors = 0
-
-    for row in raw_rows:
-        # Skip election result rows (generalelx is non-empty for these)
-        if row.get("generalelx"):
-            skipped += 1
+    for demo, table in demos.items():
+        region = REGION_ALIASES.get(demo)
+        if region is None:
+            print(f"  Skipping demo {demo!r}: not a known region")
             continue
-
-        try:
-            poll = parse_row(row)
-        except Exception as e:
-            print(f"  Error parsing row {row.get('date')} / {row.get('firm')}: {e}")
-            errors += 1
+        rows = table["rows"]
+        found[region] = found.get(region, 0) + len(rows)
+        if not rows:
             continue
+        parties = cell_parties(region, rows[0])
 
-        key = (poll["firm"], poll["lastdate"])
-        if key in existing:
-            skipped += 1
-            continue
+        for row in rows:
+            # Skip election result rows (generalelx is non-empty for these)
+            if row.get("generalelx"):
+                skipped += 1
+                continue
+
+            try:
+                polls.append(parse_row(row, region, parties))
+            except Exception as e:
+                print(f"  Error parsing {region} row {row.get('date')} / {row.get('firm')}: {e}")
+                errors += 1
+    return polls, found, skipped, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape new national polls from 338Canada")
+    parser.add_argument("--url", default=URL,
+                        help="Polls page to fetch (default: %(default)s, or $POLLS_URL)")
+    parser.add_argument("--force", action="store_true",
+                        help="Fetch and insert even if the page looks unchanged since the last run")
+    args = parser.parse_args(argv)
+
+    report = RunReport('scrape_polls')
+    try:
+        with report:
+            errors, changed = scrape(args.url, args.force)
+            if not changed:
+                report.status = 'unchanged'
+    finally:
+        report.write()
+        print(f"Stages: {report.summary()}")
+    if errors > 0:
+        sys.exit(1)
 
-        c.execute(
-            """
-            INSERT INTO polls (region, lastdate, firm, method, sample, error,
-                               lpc, cpc, ndp, gpc, bq, ppc)
-            VALUES (:region, :lastdate, :firm, :method, :sample, :error,
-                    :lpc, :cpc, :ndp, :gpc, :bq, :ppc)
-            """,
-            poll,
-        )
-        existing.add(key)
-        inserted += 1
 
-    conn.commit()
-    conn.close()
+def scrape(url, force=False):
+    """Fetch the page and insert its new polls.
 
+    Returns (number of rows that failed to parse, whether the page had changed).
+    """
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        # Created before the fetch, so --force on a fresh database can save its state too
+        conn.execute(STATE_SCHEMA)
+        state = {} if force else load_state(conn, url)
+
+        print(f"Fetching polls from {url} ...")
+        with stage('fetch'):
+            response = fetch_page(url, state)
+        if response is None:
+            print("Page not modified since the last run (HTTP 304)")
+            detail('changed', False)
+            return 0, False
+
+        with stage('parse') as timer:
+            payload, data = extract_table_data(response.text)
+            payload_sha256 = hashlib.sha256(payload.encode()).hexdigest()
+            if payload_sha256 == state.get("payload_sha256"):
+                print("Poll data unchanged since the last run")
+                detail('changed', False)
+                return 0, False
+            polls, found, skipped, errors = parse_demos(data["demos"])
+            timer.items = sum(found.values())
+        print(f"Found {sum(found.values())} polls on page: "
+              + ", ".join(f"{region} {n}" for region, n in found.items()))
+
+        # New polls and the page state go in one transaction. The state is only
+        # saved if every row parsed, so a page with bad rows is retried (and
+        # reported) again next run rather than counting as unchanged
+        with stage('insert', items=len(polls)), conn:
+            before = conn.total_changes
+            conn.executemany(
+                """
+                INSERT INTO polls (region, lastdate, firm, method, sample, error,
+                                   lpc, cpc, ndp, gpc, bq, ppc)
+                VALUES (:region, :lastdate, :firm, :method, :sample, :error,
+                        :lpc, :cpc, :ndp, :gpc, :bq, :ppc)
+                ON CONFLICT DO NOTHING
+                """,
+                polls,
+            )
+            inserted = conn.total_changes - before
+            if errors == 0:
+                save_state(conn, url, response, payload_sha256)
+    finally:
+        conn.close()
+    skipped += len(polls) - inserted
+
+    detail('changed', True)
+    detail('regions', found)
+    detail('inserted', inserted)
+    detail('skipped', skipped)
+    detail('errors', errors)
     print(f"Done: {inserted} inserted, {skipped} already in DB, {errors} errors")
-    if errors > 0:
-        sys.exit(1)
+    return errors, True
 
 
 if __name__ == "__main__":
@@ -1,26 +1,56 @@
+import json
+import sys
 import geopandas as gpd
 import pandas as pd
 from pathlib import Path
 from datetime import date
 
 PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / 'election_model'))
 
-# Load the GeoJSON file with electoral ridings
-gdf = gpd.read_file(PROJECT_ROOT / 'election_map' / 'electoral_districts_2022_fed.geojson')
+from instrumentation import RunReport, detail, stage
 
-# Load the forecasted election results
-df_election = pd.read_csv(PROJECT_ROOT / 'model_results' / 'ridingvotepercents.csv')
-df_election.columns = [col.upper() for col in df_election.columns]
+RESULTS_DIR = PROJECT_ROOT / 'model_results'
+DISTRICTS_PATH = PROJECT_ROOT / 'election_map' / 'electoral_districts_2022_fed.geojson'
+OUTPUT_PATH = PROJECT_ROOT / 'election_map' / 'election_forecast_2025.geojson'
+# Fingerprint of the model run (model_results/run.json) the GeoJSON was built from
+STAMP_PATH = PROJECT_ROOT / 'election_map' / 'election_forecast_2025.fingerprint'
 
-# Load win probabilities
-df_win_probs = pd.read_csv(PROJECT_ROOT / 'model_results' / 'ridingprobabilities.csv')
+# Model outputs the map is built from (both written by a simulation run)
+FORECAST_FILES = ['ridingvotepercents.csv', 'ridingprobabilities.csv']
+
+WIN_COLUMNS = ['LPCwins', 'CPCwins', 'NDPwins', 'GPCwins', 'BQwins', 'PPCwins']
+
+
+def load_forecast(results_dir=None):
+    '''Load the forecasted riding vote percents and win probabilities'''
+    results_dir = Path(results_dir or RESULTS_DIR)
+    for name in FORECAST_FILES:
+        if not (results_dir / name).exists():
+            raise SystemExit(missing_forecast_message(results_dir, name))
+    df_election = pd.read_csv(results_dir / 'ridingvotepercents.csv')
+    df_election.columns = [col.upper() for col in df_election.columns]
+    df_win_probs = pd.read_csv(results_dir / 'ridingprobabilities.csv')
+    return df_election, df_win_probs
+
+
+def missing_forecast_message(results_dir, name):
+    '''Why results_dir has no `name`, and what to run'''
+    manifest_path = results_dir / 'run.json'
+    mode = json.loads(manifest_path.read_text()).get('mode') if manifest_path.exists() else None
+    if mode == 'analytic':
+        return ("%s has no %s: it holds an --analytic run, which only writes riding probabilities and "
+                "seat distributions. Run election_model.py without --analytic to build the map" % (results_dir, name))
+    return "%s has no %s: run election_model.py first" % (results_dir, name)
+
+
+def add_winner_and_margin(df_win_probs):
+    '''Process win probabilities data to determine winner and margin'''
+    df_win_probs['Winner'] = df_win_probs[WIN_COLUMNS].idxmax(axis=1)
+    df_win_probs['Margin'] = df_win_probs.apply(lambda row: row[row['Winner']], axis=1)
+    return df_win_probs
 
-# Process win probabilities data to determine winner and margin
-win_columns = ['LPCwins', 'CPCwins', 'NDPwins', 'GPCwins', 'BQwins', 'PPCwins']
-df_win_probs['Winner'] = df_win_probs[win_columns].idxmax(axis=1)
-df_win_probs['Margin'] = df_win_probs.apply(lambda row: row[row['Winner']], axis=1)
 
-# Create function for assigning colour based on winner and margin of victory
 def func_colour_index(x):
     '''Assign color to riding based on most probable of outcome and margin of victory'''
     
@@ -75,33 +105,86 @@ def func_colour_index(x):
     else:
         return '#ffffff'
 
-# Apply colour function
-df_win_probs['Fill'] = df_win_probs.apply(func_colour_index, axis=1)
-
-# Ensure matching datatypes for merge columns
-gdf['FED_NUM'] = gdf['FED_NUM'].astype(int)
-df_election['DISTRICTID'] = df_election['DISTRICTID'].astype(int)
-df_win_probs['FED_NUM'] = df_win_probs['FED_NUM'].astype(int)
-
-# Perform merges
-gdf_merged = gdf.merge(
-    df_election,
-    left_on = 'FED_NUM',
-    right_on = 'DISTRICTID',
-    how = 'left'
-)    
-
-gdf_final = gdf_merged.merge(
-    df_win_probs,
-    on = 'FED_NUM',
-    how = 'left'
-)
-
-# Save merged geojson for use in map
-#filename = (str(date.today())+ "_election_results_2025.geojson")
-#gdf_final.to_file(filename, driver='GeoJSON')
-
-filename = PROJECT_ROOT / 'election_map' / 'election_forecast_2025.geojson'
-gdf_final.to_file(filename, driver='GeoJSON')
-# Success!
-print("Geojson created")
\ No newline at end of file
+
+def colour_ridings(df_win_probs):
+    '''Add the Winner, Margin and Fill colour columns to the win probabilities'''
+    df_win_probs = add_winner_and_margin(df_win_probs)
+    df_win_probs['Fill'] = df_win_probs.apply(func_colour_index, axis=1)
+    return df_win_probs
+
+
+def merge_forecast(gdf, df_election, df_win_probs):
+    '''Merge the riding results and coloured win probabilities onto the riding shapes'''
+    # Ensure matching datatypes for merge columns
+    gdf['FED_NUM'] = gdf['FED_NUM'].astype(int)
+    df_election['DISTRICTID'] = df_election['DISTRICTID'].astype(int)
+    df_win_probs['FED_NUM'] = df_win_probs['FED_NUM'].astype(int)
+
+    # Perform merges
+    gdf_merged = gdf.merge(
+        df_election,
+        left_on = 'FED_NUM',
+        right_on = 'DISTRICTID',
+        how = 'left'
+    )
+
+    return gdf_merged.merge(
+        df_win_probs,
+        on = 'FED_NUM',
+        how = 'left'
+    )
+
+
+def read_fingerprint(results_dir=None):
+    '''Fingerprint of the model run in results_dir (model_results/run.json), or None'''
+    manifest_path = Path(results_dir or RESULTS_DIR) / 'run.json'
+    return json.loads(manifest_path.read_text())['fingerprint'] if manifest_path.exists() else None
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    report = RunReport('create_geojson')
+    try:
+        with report:
+            build(argv, report)
+    finally:
+        report.write()
+        print("Stages: %s" % report.summary())
+
+
+def build(argv, report):
+    # Skip the rebuild if the model results have not changed since the last one (--force rebuilds)
+    fingerprint = read_fingerprint()
+    if ('--force' not in argv and fingerprint and OUTPUT_PATH.exists() and STAMP_PATH.exists()
+            and STAMP_PATH.read_text().strip() == fingerprint):
+        report.status = 'skipped'
+        print("Model results unchanged (fingerprint %s), Geojson kept" % fingerprint[:12])
+        return
+    detail('fingerprint', fingerprint)
+
+    # Load the GeoJSON file with electoral ridings and the forecasted election results
+    with stage('load') as timer:
+        df_election, df_win_probs = load_forecast()
+        gdf = gpd.read_file(DISTRICTS_PATH)
+        timer.items = len(gdf)
+    with stage('colour', items=len(df_win_probs)):
+        df_win_probs = colour_ridings(df_win_probs)
+    with stage('merge', items=len(gdf)):
+        gdf_final = merge_forecast(gdf, df_election, df_win_probs)
+
+    # Save merged geojson for use in map
+    #filename = (str(date.today())+ "_election_results_2025.geojson")
+    #gdf_final.to_file(filename, driver='GeoJSON')
+
+    with stage('write', items=len(gdf_final)):
+        gdf_final.to_file(OUTPUT_PATH, driver='GeoJSON')
+    if fingerprint:
+        STAMP_PATH.write_text(fingerprint + '\n')
+    elif STAMP_PATH.exists():
+        STAMP_PATH.unlink()
+    # Success!
+    print("Geojson created")
+
+
+if __name__ == '__main__':
+    main()
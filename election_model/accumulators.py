@@ -0,0 +1,58 @@
+"""
+accumulators.py - Online (Welford) mean / standard deviation accumulators.
+
+Used by the forecast engine to keep per riding x party vote-share statistics in
+O(ridings x parties) memory while simulation batches stream through. Batches
+are combined with Chan et al.'s pairwise update, which is numerically stable
+and lets partial accumulators (e.g. from different workers) be merged.
+"""
+
+import numpy as np
+
+
+class ShareAccumulator:
+    """Running count / mean / M2 for every cell of a fixed-shape matrix.
+
+    Batches passed to update() have shape (n, *shape); NaN entries are treated
+    as missing and skipped (e.g. a party not running in a riding).
+    """
+
+    def __init__(self, shape):
+        self.count = np.zeros(shape, dtype=np.int64)
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+
+    def update(self, batch):
+        """Fold a batch of observations into the running statistics."""
+        valid = np.isfinite(batch)
+        batch_count = valid.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            batch_mean = np.where(valid, batch, 0).sum(axis=0) / batch_count
+            batch_m2 = np.where(valid, batch - batch_mean, 0)
+        batch_m2 = (batch_m2 ** 2).sum(axis=0)
+        self._combine(batch_count, np.nan_to_num(batch_mean), batch_m2)
+
+    def merge(self, other):
+        """Merge another accumulator of the same shape into this one."""
+        self._combine(other.count, other.mean, other.m2)
+        return self
+
+    def _combine(self, count_b, mean_b, m2_b):
+        total = self.count + count_b
+        with np.errstate(invalid='ignore', divide='ignore'):
+            delta = mean_b - self.mean
+            weight_b = np.where(total > 0, count_b / total, 0)
+            self.mean = self.mean + delta * weight_b
+            self.m2 = self.m2 + m2_b + delta ** 2 * self.count * weight_b
+        self.count = total
+
+    def std(self, ddof=0):
+        """Standard deviation per cell; NaN where count <= ddof."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            std = np.sqrt(self.m2 / (self.count - ddof))
+        std[self.count <= ddof] = np.nan
+        return std
+
+    def means(self):
+        """Mean per cell; NaN where nothing has been observed."""
+        return np.where(self.count > 0, self.mean, np.nan)
@@ -0,0 +1,146 @@
+"""
+backfill.py - Daily forecast time series over a range of past dates, in one run.
+
+    python election_model/backfill.py --start 2025-04-29 --end 2026-08-20 --sims 10000 --workers 4
+
+The polling averages of every date come from a single vectorized
+poll_averages() call over the whole range. The baseline is built once and
+one set of standardized error draws (scenarios.draw_errors()) is shared by
+every date, so the series moves with the polls and not with Monte Carlo
+noise between days (common random numbers). Each date is then evaluated
+with forecast_engine.simulate_winners(), the dates spread over worker
+processes that memory-map the one copy of the draws.
+
+Writes to model_results/backfill/
+    seatseries.csv     date, party, poll, mean, p05, p50, p95, majority, most_seats
+                       (majority and most_seats in percent)
+    ridingseries.csv   date, FED_NUM, LPCwins ... PPCwins (win percent, ridingprobabilities.csv layout)
+
+Dates without a national poll in the previous 28 days are left out.
+"""
+
+import argparse
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from error_models import ERROR_MODELS, get_error_model
+from forecast_engine import PARTIES, BATCH_SIZE, riding_probabilities, riding_win_counts, simulate_winners
+from forecast_model import PROJECT_ROOT, ForecastModel
+from forecast_history import SUMMARY_COLUMNS, seat_summary
+from polls import poll_averages
+from scenarios import DRAWS_FILE, draw_errors
+
+# Day after the 2025 federal election
+DEFAULT_START = date(2025, 4, 29)
+
+OUTPUT_DIR = PROJECT_ROOT / 'model_results' / 'backfill'
+
+# Per-process error draws, set once by the pool initializer
+_worker_draws = None
+
+
+def _init_worker(draws_path):
+    global _worker_draws
+    _worker_draws = np.load(draws_path, mmap_mode='r')
+
+
+def forecast_day(baseline, riding_polls, margin_of_error, draws=None):
+    """Seat summary and riding win counts for one date's inputs on the shared draws.
+
+    Returns ((P, 6) mean, p05, p50, p95, P(majority) and P(most seats) in
+    percent, (R, P) riding win counts).
+    """
+    draws = _worker_draws if draws is None else draws
+    seats, winners = simulate_winners(baseline, riding_polls, margin_of_error, draws)
+    return seat_summary(seats, baseline), riding_win_counts(winners)
+
+
+def backfill_dates(model, start, end):
+    """Dates from `start` to `end` that have polls, with their ((D, P) averages, (D,) margins of error)."""
+    dates = np.arange(np.datetime64(start, 'D'), np.datetime64(end, 'D') + 1)
+    averages, margins = poll_averages(model.polls, dates)
+    polled = np.isfinite(margins)
+    return dates[polled], averages[polled], margins[polled]
+
+
+def backfill(model, start=DEFAULT_START, end=None, n_sims=10000, seed=None, error_model=None, regional=False,
+             workers=1, chunk_size=BATCH_SIZE):
+    """Forecast every polled date from `start` to `end` on one set of error draws.
+
+    Returns (seat series DataFrame, riding series DataFrame, seed).
+    """
+    end = end or date.today()
+    dates, averages, margins = backfill_dates(model, start, end)
+    if len(dates) == 0:
+        raise ValueError(f"No national polls between {start} and {end}")
+
+    inputs = []
+    for as_of, day_averages, margin_of_error in zip(dates.tolist(), averages, margins):
+        baseline, riding_polls, _ = model.swing_inputs(day_averages, as_of, regional)
+        inputs.append((baseline, riding_polls, float(margin_of_error)))
+
+    draws, seed_seq = draw_errors(model.baseline, n_sims, chunk_size, seed, get_error_model(error_model))
+    if workers > 1:
+        with tempfile.TemporaryDirectory() as tmp:
+            draws_path = Path(tmp) / DRAWS_FILE
+            np.save(draws_path, draws)
+            del draws
+            with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(draws_path,)) as pool:
+                results = list(pool.map(forecast_day, *zip(*inputs)))
+    else:
+        results = [forecast_day(*day, draws=draws) for day in inputs]
+
+    day_index = pd.Index(pd.to_datetime(dates).date, name='date')
+    stats = np.stack([day_stats for day_stats, _ in results])
+    seat_series = pd.DataFrame({
+        'date': np.repeat(day_index, len(PARTIES)),
+        'party': np.tile(PARTIES, len(dates)),
+        'poll': averages.ravel(),
+    })
+    columns = SUMMARY_COLUMNS[1:]  # after 'poll'
+    seat_series[columns] = stats.reshape(-1, len(columns))
+    seat_series[columns] = seat_series[columns].round(2)
+
+    riding_series = pd.concat(
+        [riding_probabilities(model.baseline, counts, n_sims) for _, counts in results],
+        keys=day_index,
+    )
+    return seat_series, riding_series, seed_seq.entropy
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Daily forecast time series over a range of past dates')
+    parser.add_argument('--start', type=date.fromisoformat, default=DEFAULT_START,
+                        help=f'first forecast date (YYYY-MM-DD, default {DEFAULT_START})')
+    parser.add_argument('--end', type=date.fromisoformat, default=None, help='last forecast date (default today)')
+    parser.add_argument('--baseline', default='current', help='riding baseline strategy')
+    parser.add_argument('--sims', type=int, default=10000, help='simulations per date, shared by every date')
+    parser.add_argument('--seed', type=int, default=None, help='seed for reproducible draws')
+    parser.add_argument('--workers', type=int, default=1, help='number of worker processes')
+    parser.add_argument('--error-model', choices=sorted(ERROR_MODELS), default='independent', help='polling error model')
+    parser.add_argument('--regional', action='store_true', help='swing ridings with their region\'s polls')
+    parser.add_argument('--output', type=Path, default=OUTPUT_DIR, help='output directory')
+    args = parser.parse_args(argv)
+
+    start_time = time.time()
+    model = ForecastModel.load(args.baseline)
+    seat_series, riding_series, seed = backfill(model, args.start, args.end, args.sims, args.seed,
+                                                args.error_model, args.regional, args.workers)
+    args.output.mkdir(parents=True, exist_ok=True)
+    seat_series.to_csv(args.output / 'seatseries.csv', index=False)
+    riding_series.to_csv(args.output / 'ridingseries.csv', index=True)
+
+    num_days = seat_series['date'].nunique()
+    print("Backfilled %d dates (%s to %s), seed: %s, simulations per date: %d"
+          % (num_days, seat_series['date'].iloc[0], seat_series['date'].iloc[-1], seed, args.sims))
+    print("Run time: %s seconds" % (time.time() - start_time))
+
+
+if __name__ == '__main__':
+    main()
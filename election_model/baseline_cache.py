@@ -0,0 +1,104 @@
+"""
+baseline_cache.py - Content-hashed on-disk cache of compiled baselines.
+
+Building a Baseline joins riding_results with ridings, merges election years
+and pivots the result into matrices. The inputs only change when historical
+results are imported or migrated, so the compiled arrays are saved to an .npz
+file keyed by a hash of
+
+    - the source rows the strategy reads (BaselineStrategy.sources),
+    - the strategy class, its parameters and identity (e.g. a loader
+      function's name and bytecode),
+    - the engine's party axis.
+
+Strategies that are not `cacheable` (plain loader functions without an
+explicit cache key and sources) are always rebuilt.
+
+Any change to those rows (import_2025_results.py, a migration, ...) changes
+the key, so a stale cache is never loaded: the baseline is rebuilt and the
+old file for that strategy (and parameters) is replaced.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from forecast_engine import PARTIES, Baseline
+
+PROJECT_ROOT = Path(__file__).parent.parent
+CACHE_DIR = PROJECT_ROOT / '.cache' / 'baselines'
+
+# Bump when the Baseline layout changes
+CACHE_VERSION = 2
+
+BASELINE_FIELDS = ['riding_ids', 'provinces', 'shares', 'present', 'national', 'votes']
+
+
+def source_fingerprint(conn, sources):
+    """sha256 over the given table columns, row by row in storage order."""
+    digest = hashlib.sha256()
+    for table, columns in sorted(sources.items()):
+        row_expr = " || ',' || ".join(f"quote({col})" for col in columns)
+        (rows,) = conn.execute(f"SELECT group_concat({row_expr}, char(10)) FROM {table}").fetchone()
+        digest.update(f"{table}:{rows or ''}\n".encode())
+    return digest.hexdigest()
+
+
+def strategy_id(strategy):
+    """Short hash identifying a strategy class, its parameters and identity."""
+    spec = {
+        'version': CACHE_VERSION,
+        'strategy': f"{type(strategy).__module__}.{type(strategy).__qualname__}",
+        'name': strategy.name,
+        'params': strategy.params,
+        'identity': strategy.identity,
+        'parties': PARTIES,
+    }
+    return hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()[:12]
+
+
+def cache_key(conn, strategy):
+    """Key of the compiled baseline for `strategy` over the current database contents."""
+    return f"{strategy_id(strategy)}_{source_fingerprint(conn, strategy.sources)[:16]}"
+
+
+def save_baseline(baseline, path):
+    """Write a Baseline to `path` atomically (readers never see a partial file)."""
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'wb') as f:
+        np.savez(f, parties=np.array(PARTIES), **{field: getattr(baseline, field) for field in BASELINE_FIELDS})
+    os.replace(tmp, path)
+
+
+def read_baseline(path):
+    with np.load(path) as data:
+        if list(data['parties']) != PARTIES:
+            raise ValueError(f"{path} was built for parties {list(data['parties'])}")
+        return Baseline(**{field: data[field] for field in BASELINE_FIELDS})
+
+
+def load_or_build(conn, strategy, cache_dir=CACHE_DIR):
+    """Return (baseline, key), loading the cached arrays if the key matches or building and caching them.
+
+    A strategy that is not cacheable is built every time and returned with key None.
+    """
+    if not strategy.cacheable:
+        return strategy.build(conn), None
+    key = cache_key(conn, strategy)
+    prefix = f"baseline_{strategy.name or 'custom'}_{strategy_id(strategy)}_"
+    path = Path(cache_dir) / f"baseline_{strategy.name or 'custom'}_{key}.npz"
+    if path.exists():
+        try:
+            return read_baseline(path), key
+        except (OSError, ValueError, KeyError):
+            pass  # unreadable or outdated file: rebuild below
+
+    baseline = strategy.build(conn)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    for stale in path.parent.glob(f"{prefix}*.npz"):
+        stale.unlink()
+    save_baseline(baseline, path)
+    return baseline, key
@@ -0,0 +1,206 @@
+"""
+baselines.py - Baseline strategies for the forecast engine.
+
+A strategy turns the historical results in election_database.db into the
+riding x party Baseline the engine simulates from. Built-in strategies:
+
+    CurrentYearBaseline(2025)                          one election only
+    WeightedBaseline({2025: 0.6, 2021: 0.3, 2019: 0.1}) multi-election blend
+
+New baselines subclass BaselineStrategy (implement build(conn), describe
+their parameters in `params` and any extra tables they read in `sources`) and
+can be made available to the command line with register_baseline().
+"""
+
+import hashlib
+
+import pandas as pd
+
+from forecast_engine import build_baseline
+
+DEFAULT_WEIGHTS = {2025: 0.6, 2021: 0.3, 2019: 0.1}
+
+
+class BaselineStrategy:
+    """Builds a Baseline from an open election_database.db connection."""
+
+    name = None
+
+    # Table -> columns the strategy reads; baseline_cache.py hashes these to
+    # decide when a cached baseline is stale
+    sources = {
+        'riding_results': ['id', 'year', 'party', 'votecount', 'votepercent'],
+        'ridings': ['id', 'province'],
+        'federal_results': ['party', 'voteshare2015', 'voteshare2019', 'voteshare2021', 'voteshare2025'],
+    }
+
+    # Whether baseline_cache.py may cache what build() returns; a strategy
+    # whose inputs are not all described by its class, params and sources
+    # must set this to False
+    cacheable = True
+
+    @property
+    def params(self):
+        """Parameters that change the baseline this strategy builds."""
+        return {}
+
+    @property
+    def identity(self):
+        """Anything besides the class and params that identifies what build() does (part of the cache key)."""
+        return None
+
+    def build(self, conn):
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.params})"
+
+
+def fetch_riding_year(conn, year):
+    """Riding results (id, party, votepercent) for one election year."""
+    rows = conn.execute(
+        "SELECT t1.id, t1.party, t1.votepercent "
+        "FROM riding_results AS t1 JOIN ridings AS t2 ON t1.id = t2.id "
+        "WHERE t1.year = ?", (year,)
+    )
+    return pd.DataFrame(rows, columns=['id', 'party', 'votepercent'])
+
+
+def fetch_riding_votes(conn, year):
+    """{riding id: votes cast} for one election year."""
+    return dict(conn.execute("SELECT id, SUM(votecount) FROM riding_results WHERE year = ? GROUP BY id", (year,)))
+
+
+def fetch_provinces(conn):
+    """{riding id: province code} from the ridings table."""
+    return dict(conn.execute("SELECT id, province FROM ridings"))
+
+
+def fetch_national_shares(conn, year):
+    """{party: national vote share} for one election year, from federal_results."""
+    rows = conn.execute(f"SELECT party, voteshare{int(year)} FROM federal_results")
+    return {party.lower(): share for party, share in rows}
+
+
+class CurrentYearBaseline(BaselineStrategy):
+    """Riding and national baseline taken from a single election (the original model)."""
+
+    name = 'current'
+
+    def __init__(self, year=2025):
+        self.year = year
+
+    @property
+    def params(self):
+        return {'year': self.year}
+
+    def build(self, conn):
+        return build_baseline(fetch_riding_year(conn, self.year), fetch_national_shares(conn, self.year),
+                              fetch_provinces(conn), fetch_riding_votes(conn, self.year))
+
+
+class WeightedBaseline(BaselineStrategy):
+    """Blend of several elections, e.g. 2025 = 60%, 2021 = 30%, 2019 = 10%.
+
+    The riding list, party slate and riding votes come from `base_year`, by
+    default the most recent weighted year, whatever order the weights are
+    given in. Where a
+    party has no result in another year - e.g. the 5 ridings created by
+    redistribution have no 2019 data - the base year's value is used, so its
+    weight effectively rolls into the base result.
+    """
+
+    name = 'weighted'
+
+    def __init__(self, weights=None, base_year=None):
+        self.weights = dict(weights or DEFAULT_WEIGHTS)
+        self.base_year = max(self.weights) if base_year is None else base_year
+        if self.base_year not in self.weights:
+            raise ValueError(f"Base year {self.base_year} is not one of the weighted years "
+                             f"{sorted(self.weights)}")
+
+    @property
+    def params(self):
+        return {'weights': {str(year): weight for year, weight in self.weights.items()},
+                'base_year': self.base_year}
+
+    def build(self, conn):
+        base_year = self.base_year
+        years = [base_year] + [year for year in self.weights if year != base_year]
+
+        national = None
+        for year, weight in self.weights.items():
+            shares = weight * pd.Series(fetch_national_shares(conn, year), dtype=float)
+            national = shares if national is None else national + shares
+
+        riding = fetch_riding_year(conn, base_year)
+        for year in years[1:]:
+            other = fetch_riding_year(conn, year).rename(columns={'votepercent': f'vp{year}'})
+            riding = riding.merge(other, on=['id', 'party'], how='left')
+            riding[f'vp{year}'] = riding[f'vp{year}'].fillna(riding['votepercent'])
+
+        blended = self.weights[base_year] * riding['votepercent']
+        for year in years[1:]:
+            blended = blended + self.weights[year] * riding[f'vp{year}']
+        riding['votepercent'] = blended
+        return build_baseline(riding[['id', 'party', 'votepercent']], national.to_dict(), fetch_provinces(conn),
+                              fetch_riding_votes(conn, base_year))
+
+
+class FunctionBaseline(BaselineStrategy):
+    """Wraps a plain `loader(conn) -> Baseline` function as a strategy.
+
+    Nothing tells the cache what a function reads or when its code changed,
+    so its baseline is rebuilt on every load unless the caller supplies both
+    a `cache_key` (changed whenever the loader's behaviour changes) and the
+    `sources` it reads. The key also covers the loader's module, qualified
+    name and bytecode, so two different loaders never share a cache entry.
+    """
+
+    def __init__(self, loader, name=None, cache_key=None, sources=None, **params):
+        self.loader = loader
+        self.name = name or loader.__name__
+        self.cache_key = cache_key
+        if sources is not None:
+            self.sources = sources
+        self.cacheable = cache_key is not None and sources is not None
+        self._params = params
+
+    @property
+    def params(self):
+        return dict(self._params)
+
+    @property
+    def identity(self):
+        code = getattr(self.loader, '__code__', None)
+        code_hash = None
+        if code is not None:
+            code_hash = hashlib.sha256(code.co_code + repr(code.co_consts).encode()).hexdigest()[:16]
+        return {
+            'loader': f"{getattr(self.loader, '__module__', None)}.{getattr(self.loader, '__qualname__', None)}",
+            'code': code_hash,
+            'cache_key': self.cache_key,
+        }
+
+    def build(self, conn):
+        return self.loader(conn)
+
+
+BASELINES = {
+    'current': CurrentYearBaseline,
+    'weighted': WeightedBaseline,
+}
+
+
+def register_baseline(name, factory):
+    """Make a strategy class (or factory) available by name, e.g. to --baseline."""
+    BASELINES[name] = factory
+
+
+def get_baseline(strategy, **kwargs):
+    """Resolve a strategy name, instance or loader function to a BaselineStrategy."""
+    if isinstance(strategy, BaselineStrategy):
+        return strategy
+    if isinstance(strategy, str):
+        return BASELINES[strategy](**kwargs)
+    return FunctionBaseline(strategy)
@@ -0,0 +1,112 @@
+"""
+comparison.py - Common-random-numbers comparison of baseline variants.
+
+Every variant is simulated on the same pre-drawn error tensor, so the
+difference between a variant and the reference is measured simulation by
+simulation. Paired differences cancel the shared Monte Carlo noise, which
+makes their standard errors far smaller than those of two independent runs
+and lets a comparison settle with a fraction of the simulations.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from accumulators import ShareAccumulator
+from forecast_engine import PARTIES, BATCH_SIZE, RunningAggregates, simulate_batch
+
+
+def winner_indicators(winners, num_parties=len(PARTIES)):
+    """(n, R, P) 0/1 array marking each riding's winner in each simulation."""
+    return (winners[..., None] == np.arange(num_parties)).astype(float)
+
+
+@dataclass
+class PairedDifference:
+    """Paired (variant - reference) statistics, accumulated simulation by simulation."""
+    seats: ShareAccumulator       # (P,)   seat count differences
+    win_prob: ShareAccumulator    # (R, P) riding winner indicator differences
+    vote_share: ShareAccumulator  # (R, P) vote share differences, where both variants ran
+
+    @staticmethod
+    def _se(acc):
+        return acc.std(ddof=1) / np.sqrt(acc.count)
+
+    def seat_mean(self):
+        return self.seats.means()
+
+    def seat_se(self):
+        return self._se(self.seats)
+
+    def win_prob_mean(self):
+        """Difference in riding win probability, in percentage points."""
+        return self.win_prob.means() * 100
+
+    def win_prob_se(self):
+        return self._se(self.win_prob) * 100
+
+    def vote_share_mean(self):
+        return self.vote_share.means()
+
+    def vote_share_se(self):
+        return self._se(self.vote_share)
+
+
+def compare_baselines(baselines, poll_averages, margin_of_error, numsims, chunk_size=BATCH_SIZE, seed=None,
+                      error_model=None):
+    """Simulate every baseline on common random numbers.
+
+    The first baseline is the reference. All baselines must share the same
+    ridings (the same riding x party axes). The shared error draws come from
+    `error_model` (see error_models.py), independent per riding by default.
+
+    Returns (aggregates, differences): one RunningAggregates per baseline and
+    one PairedDifference per non-reference baseline.
+    """
+    reference = baselines[0]
+    for baseline in baselines[1:]:
+        if not np.array_equal(baseline.riding_ids, reference.riding_ids):
+            raise ValueError("Baselines must cover the same ridings to be compared")
+
+    shape = (reference.num_ridings, len(PARTIES))
+    aggregates = [RunningAggregates(baseline) for baseline in baselines]
+    differences = [
+        PairedDifference(ShareAccumulator(len(PARTIES)), ShareAccumulator(shape), ShareAccumulator(shape))
+        for _ in baselines[1:]
+    ]
+
+    seed_seq = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    sizes = [min(chunk_size, numsims - start) for start in range(0, numsims, chunk_size)]
+    for size, child in zip(sizes, seed_seq.spawn(len(sizes))):
+        rng = np.random.default_rng(child)
+        if error_model is None:
+            draws = rng.standard_normal((size,) + shape)
+        else:
+            draws = error_model.sample(rng, size, reference)
+        results = [simulate_batch(baseline, poll_averages, margin_of_error, size, draws=draws)
+                   for baseline in baselines]
+        for agg, (seats, winners, shares) in zip(aggregates, results):
+            agg.add(seats, winners, shares)
+
+        ref_seats, ref_winners, ref_shares = results[0]
+        ref_wins = winner_indicators(ref_winners)
+        for diff, (seats, winners, shares) in zip(differences, results[1:]):
+            diff.seats.update((seats - ref_seats).astype(float))
+            diff.win_prob.update(winner_indicators(winners) - ref_wins)
+            diff.vote_share.update(shares - ref_shares)
+    return aggregates, differences
+
+
+def independent_se_ratio(ref, variant, diff):
+    """Median ratio of independent-runs SE to paired SE for riding win probabilities.
+
+    Shows how many times more simulations two independent runs would need
+    (squared) to match the paired estimate's precision.
+    """
+    n = ref.numsims
+    p_ref = ref.win_counts / n
+    p_var = variant.win_counts / n
+    independent = np.sqrt((p_ref * (1 - p_ref) + p_var * (1 - p_var)) / n) * 100
+    paired = diff.win_prob_se()
+    moving = (paired > 0) & (independent > 0)
+    return float(np.median(independent[moving] / paired[moving])) if moving.any() else float('nan')
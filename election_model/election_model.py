@@ -10,286 +10,219 @@
 ######################################################################################################################
 # Import libraries
 ######################################################################################################################
-import sqlite3, csv, os, pathlib, time
-import pandas as pd
-import numpy as np
+import argparse, pathlib, sqlite3, time
+
+from datetime import date
+from baselines import BASELINES, DEFAULT_WEIGHTS, get_baseline
+from error_models import DEFAULT_SPLIT, ERROR_MODELS, SAMPLERS, get_error_model
+from forecast_engine import BATCH_SIZE, chunk_size_for_budget
+from analytic import deviation_from
+from forecast_history import record_run
+from forecast_model import DB_PATH, ForecastModel, csv_outputs, export_analytic_csv, export_csv
+from instrumentation import REPORTS_DIR, RunReport, detail, stage
+from run_manifest import is_current, write_manifest
+from sample_store import SAMPLE_FILES, save_samples
 
-from datetime import date, datetime
-
-######################################################################################################################
-# Set directory, enable coding timer, and connect SQLite3 database
-######################################################################################################################
 PROJECT_ROOT = pathlib.Path(__file__).parent.parent
-
-start_time = time.time()
-
-conn = sqlite3.connect(PROJECT_ROOT / 'election_database' / 'election_database.db')
-c = conn.cursor()
-
-######################################################################################################################
-# Import 2025 election results as national baseline
-######################################################################################################################
-results2025 = c.execute("SELECT party, voteshare2025 FROM federal_results")
-election2021 = pd.DataFrame(results2025)
-election2021 = dict(zip(election2021[0], election2021[1]))
-election2021 = {k.lower(): v for k, v in election2021.items()}
+RESULTS_DIR = PROJECT_ROOT / 'model_results'
 
 ######################################################################################################################
-# Import riding results and Election Model variables
+# Command line options
 ######################################################################################################################
-nationaltable = c.execute("SELECT t1.id, t2.province, t2.riding_name, t1.party, t1.votepercent, t1.leanvsfederal FROM riding_results AS t1 JOIN ridings AS t2 ON t1.id = t2.id WHERE t1.year = 2025")
-nationaldatabase = pd.DataFrame(nationaltable, columns=['id', 'province', 'riding_name', 'party', 'votepercent', 'leanvsfederal'])
-
-######################################################################################################################
-# Build riding lookup dict and riding ID list (avoids per-riding SQL queries during simulation)
-######################################################################################################################
-riding_data = {
-    rid: list(zip(group['party'], group['votepercent'].astype(float)))
-    for rid, group in nationaldatabase.groupby('id')
-}
-ridingidlist = list(riding_data.keys())
-
-
-######################################################################################################################
-# Create DataFrame to store all election simulation results
-######################################################################################################################
-dfridingprobabilities = pd.DataFrame(index = ridingidlist, columns = ['lpc', 'cpc', 'ndp', 'gpc', 'bq', 'ppc'])
-dfridingprobabilities.index.name = 'FED_NUM'
-dfridingprobabilities = dfridingprobabilities.fillna(0)
-
-######################################################################################################################
-# Import polling data from election_database.db
-######################################################################################################################
-pollsdict = c.execute("SELECT * FROM polls WHERE region = 'National'")
-polls = pd.DataFrame(pollsdict, columns = ['region', 'lastdate', 'firm', 'method', 'sample', 'error', 'lpc', 'cpc', 'ndp', 'gpc', 'bq', 'ppc'])
-polls = polls.replace(r'^\s*$', 0, regex=True)
-
-######################################################################################################################
-# Set global variables for poll weighting
-######################################################################################################################
-weights = []
-today = date.today()
-today = datetime.strptime(str(today), "%Y-%m-%d")
-polldate = datetime.strptime(polls['lastdate'][1], "%Y-%m-%d")
-j = len(polls)
-
-######################################################################################################################
-# Calculate weighting off individual polls based on sample size and date
-######################################################################################################################
-for i in range(j):
-    sizeweight = ((int(polls['sample'][i]) / 600) ** 0.5)
-    polldate = datetime.strptime(polls['lastdate'][i], "%Y-%m-%d")
-    datediff = abs((today - polldate).days)
-    if int(datediff) < 8:
-        totweight = sizeweight * 1
-    elif 29 > int(datediff) > 7 :
-        totweight = sizeweight * (1 - (0.047 * (int(datediff) - 7)))
-    else:
-        totweight = 0
-    weights.append(round(totweight, 2))
-polls['weight'] = weights
-
-######################################################################################################################
-# Function to apply poll weightings
-######################################################################################################################
-def weightavg(party):
+def parse_weights(text):
     '''
-    Calculates the weighted polling average for each party
+    Parses baseline weights given as "2025=0.6,2021=0.3,2019=0.1"
     '''
-    return round(np.average(polls[party].astype('float64'), weights= polls['weight'].astype('float64')), 1)
+    weights = {}
+    for item in text.split(','):
+        year, weight = item.split('=')
+        weights[int(year)] = float(weight)
+    return weights
 
-######################################################################################################################
-# Global variables for storing model outputs
-######################################################################################################################
-n = 1
-path = PROJECT_ROOT / 'model_results'
-path.mkdir(exist_ok=True)
 
-######################################################################################################################
-# Monte Carlo Simulation
-######################################################################################################################
-# Function to account for margin of error
-MarginOfError = weightavg('error')
-poll_averages = {}
-for _party in ['lpc', 'cpc', 'ndp', 'gpc', 'bq', 'ppc']:
-    try:
-        poll_averages[_party] = weightavg(_party)
-    except Exception:
-        poll_averages[_party] = 0.0
-
-def AddErr(pollresult):
+def parse_split(text):
     '''
-    Applies random error using a normal distribution and the weighted poll margin of error for each simulation
+    Parses a national,regional,riding error variance split given as "0.6,0.25,0.15"
     '''
-    x = np.random.normal() # generate normal distribution
-    x = x/2 # 95% chance of x being between 1 and -1
-    x = x * MarginOfError
-    return x + pollresult # Apply margin of polling error
-
-# Function to simulate multiple elections
-def SimulateMultipleElections(numsims):
+    return tuple(float(share) for share in text.split(','))
+
+
+def build_parser(default_baseline='current'):
+    parser = argparse.ArgumentParser(description='Canadian federal election forecast model')
+    parser.add_argument('--baseline', choices=sorted(BASELINES), default=default_baseline,
+                        help='riding baseline strategy: current (2025 only) or weighted (multi-election blend)')
+    parser.add_argument('--weights', type=parse_weights, default=None,
+                        help='weighted baseline blend, e.g. 2025=0.6,2021=0.3,2019=0.1 (default %s)'
+                        % ','.join(f'{y}={w}' for y, w in DEFAULT_WEIGHTS.items()))
+    parser.add_argument('--no-baseline-cache', action='store_true', help='rebuild the baseline without the on-disk cache')
+    parser.add_argument('--sims', type=int, default=10000, help='number of simulations to run (cap with --adaptive)')
+    parser.add_argument('--seed', type=int, default=None, help='seed (default: derived from the run inputs)')
+    parser.add_argument('--as-of', type=date.fromisoformat, default=None, help='forecast date (YYYY-MM-DD, default today)')
+    parser.add_argument('--workers', type=int, default=1, help='number of worker processes')
+    parser.add_argument('--chunk-size', type=int, default=BATCH_SIZE, help='simulations per chunk')
+    parser.add_argument('--memory-budget-mb', type=float, default=None, help='size chunks to fit this budget')
+    parser.add_argument('--adaptive', action='store_true', help='stop once Monte Carlo errors are within tolerance')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='max standard error of riding win %% (adaptive)')
+    parser.add_argument('--seat-tolerance', type=float, default=0.25, help='max standard error of mean seats (adaptive)')
+    parser.add_argument('--min-sims', type=int, default=2000, help='minimum number of simulations (adaptive)')
+    parser.add_argument('--error-model', choices=sorted(ERROR_MODELS), default='independent',
+                        help='polling error: independent per riding, or correlated national/regional/riding')
+    parser.add_argument('--error-split', type=parse_split, default=None,
+                        help='correlated error variance split national,regional,riding (default %s)'
+                        % ','.join(str(share) for share in DEFAULT_SPLIT))
+    parser.add_argument('--party-correlation', type=float, default=None,
+                        help='correlation between the polling errors of any two parties (correlated)')
+    parser.add_argument('--sampler', choices=sorted(SAMPLERS), default='random',
+                        help='normal draws: random, antithetic pairs or scrambled Sobol (needs scipy)')
+    parser.add_argument('--regional', action='store_true',
+                        help='swing ridings with their region\'s polls where there are enough of them')
+    parser.add_argument('--analytic', action='store_true',
+                        help='closed-form fast forecast: ridingprobabilities.csv and seatdistribution.csv only')
+    parser.add_argument('--check-sims', type=int, default=0,
+                        help='with --analytic, also run this many simulations and report the largest deviation')
+    parser.add_argument('--save-samples', action='store_true',
+                        help='also save per-simulation seats and riding winners to model_results/samples')
+    parser.add_argument('--skip-if-unchanged', action='store_true',
+                        help='keep model_results as they are if they were made from the same inputs')
+    parser.add_argument('--history', action='store_true',
+                        help='also store the run (seat summary, riding win counts) in the database\'s forecast history')
+    parser.add_argument('--report', type=pathlib.Path, default=REPORTS_DIR / 'election_model.json',
+                        help='where to write the JSON run report (stage timings and memory)')
+    parser.add_argument('--no-progress', action='store_true', help='do not log simulation progress')
+    return parser
+
+######################################################################################################################
+# Run the forecast and export model results
+######################################################################################################################
+def build_error_model(args):
     '''
-    Simulates multiple elections using the simulate election function
+    The error model the command line options describe
     '''
-    # Collect results as lists; build DataFrames once after the loop (avoids O(n^2) pd.concat)
-    election_rows = []
-    riding_results_list = []
-    # Set win counts to zero
-    lpc = cpc = ndp = gpc = bq = ppc = 0
-
-    # iterate over the number of desired simulations
-    for sim in range(numsims):
-        # run single simulation
-        lpcwins, cpcwins, ndpwins, gpcwins, bqwins, ppcwins, dfridingresults = SimulateElection()
-        # collect riding percentages
-        riding_results_list.append(dfridingresults)
-        # create dict of parties and vote counts
-        parties = {'lpc': lpcwins, 'cpc': cpcwins, 'ndp': ndpwins, 'gpc': gpcwins, 'bq': bqwins, 'ppc': ppcwins}
-        # determine winner of simulation
-        winner = max(parties, key = parties.get)
-        # collect election results
-        election_rows.append({'lpc': lpcwins, 'cpc': cpcwins, 'ndp': ndpwins, 'gpc': gpcwins, 'bq': bqwins, 'ppc': ppcwins})
-        # tick up win count for winner
-        if winner == 'lpc':
-            lpc += 1
-        elif winner == 'cpc':
-            cpc += 1
-        elif winner == 'ndp':
-            ndp += 1
-        elif winner == 'gpc':
-            gpc += 1
-        elif winner == 'bq':
-            bq += 1
-        else:
-            ppc += 1
-    dfelectionresults = pd.DataFrame(election_rows)
-    dfridingpercentages = pd.concat(riding_results_list, ignore_index=True)
-    """
-    # output probability of each party winning the most seats
-    problpc = lpc / numsims
-    probcpc = cpc / numsims
-    probndp = ndp / numsims
-    probgpc = gpc / numsims
-    probbq = bq / numsims
-    probppc = ppc / numsims
-
-    probsrow = pd.DataFrame({'lpc': problpc, 'cpc': probcpc, 'ndp': probndp, 'gpc': probgpc, 'bq': probbq, 'ppc': probppc}, index = [0])
-    dfelectionresults = pd.concat([probsrow, dfelectionresults[:]]).reset_index(drop = True)
-    """
-    
-    # export overall election probability dataframe
-    electionsimspath = os.path.join(path, 'seatcounts.csv')
-    dfelectionresults.to_csv(electionsimspath, index = False)
-
-    # calculate mean, max, and minimum seat counts
-    seatprojectionstats = pd.DataFrame()
-    seatprojectionstats['max'] = dfelectionresults.max()
-    seatprojectionstats['min'] = dfelectionresults.min()
-    seatprojectionstats['mean'] = dfelectionresults.mean()
-    seatprojectionpath = os.path.join(path, 'seatstats.csv')
-    seatprojectionstats.to_csv(seatprojectionpath, index = False)
-
-    # calculate election odds for each party in each riding
-    global dfridingprobabilities
-    dfridingprobabilities = dfridingprobabilities.map(lambda x: round(x / numsims * 100, 1))
-
-    # export riding probabilities dataframe
-    ridingprobpath = os.path.join(path, 'ridingprobabilities.csv')
-    dfridingprobabilities = dfridingprobabilities.rename(columns={'': 'FED_NUM', 'lpc': 'LPCwins', 'cpc': 'CPCwins', 'ndp': 'NDPwins', 'gpc': 'GPCwins', 'bq': 'BQwins', 'ppc': 'PPCwins'})
-    dfridingprobabilities.to_csv(ridingprobpath, index = True)
-
-    # calculate the average vote percentage for each party in each riding
-    dfridingpercentagesavg = dfridingpercentages.groupby(['districtid', 'party']).mean()
-    dfridingpercentagesavg = dfridingpercentagesavg.pivot_table(index = 'districtid', columns = 'party', values = 'votepercent')
-    dfridingpercentagesavg = dfridingpercentagesavg.round(1)
-    if "ppc" not in dfridingpercentagesavg:
-        dfridingpercentagesavg['ppc'] = np.nan
-    
-    # calculate 2 standard deviations
-    dfridingpercentagesstd = dfridingpercentages.groupby(['districtid', 'party']).std(ddof = 4)
-    dfridingpercentagesstd = dfridingpercentagesstd.pivot_table(index = 'districtid', columns = 'party', values = 'votepercent')
-    dfridingpercentagesstd = round(dfridingpercentagesstd * 2, 1)
-    dfridingpercentagesstd = dfridingpercentagesstd.rename(columns = {'bq':'bqstd', 'cpc':'cpcstd', 'gpc':'gpcstd', 'lpc':'lpcstd', 'ndp':'ndpstd', 'ppc':'ppcstd'})
-    masterdf = pd.merge(dfridingpercentagesavg, dfridingpercentagesstd, on = 'districtid', how = 'left')
-    masterdf = masterdf.fillna(0)
-
-   # export riding results
-    ridingpercentpath = os.path.join(path, 'ridingvotepercents.csv')
-    masterdf.to_csv(ridingpercentpath, index = True)
-
-    print("Run time: %s seconds" % (time.time() - start_time))
-
-######################################################################################################################
-# Function to simulate a single election
-######################################################################################################################
-def SimulateElection():
-    lpcwins = cpcwins = ndpwins = gpcwins = bqwins = ppcwins = 0
-    p = 0
-    # Collect rows as a list; build DataFrame once at end (avoids O(n^2) pd.concat)
-    riding_rows = []
+    error_options = {'sampler': args.sampler}
+    if args.error_split is not None:
+        error_options['split'] = args.error_split
+    if args.party_correlation is not None:
+        error_options['party_correlation'] = args.party_correlation
+    try:
+        return get_error_model(args.error_model, **error_options)
+    except (ImportError, ValueError) as e:
+        raise SystemExit(str(e))
 
-    # Perform one simulation for each riding
-    for ridingid in ridingidlist:
-        resultsdict = {}
 
-        # Calculate election chances for each party using pre-loaded riding data
-        for party, vote2025 in riding_data[ridingid]:
-            try:
-                party = party.lower()
-                partypoll = poll_averages[party] # pre-computed weighted polling average
-                pollwerr = AddErr(partypoll) # apply polling error
-                natvote = float(election2021[party]) # national vote percentage from 2025 baseline
-                propchange = (pollwerr - natvote) / natvote # proportion of change
-                newvote = vote2025 + (propchange * vote2025) # recalculate vote
-                if newvote < 0:
-                    newvote = 0
+def run_config(args, error_model, chunk_size):
+    '''
+    Settings besides the baseline, polls, seed and number of simulations that change the output (fingerprinted)
+    '''
+    config = {'error_model': {'name': error_model.name, **error_model.options()}, 'chunk_size': chunk_size,
+              'save_samples': args.save_samples}
+    if args.adaptive:
+        config['adaptive'] = {'tolerance': args.tolerance, 'seat_tolerance': args.seat_tolerance,
+                              'min_sims': args.min_sims}
+    return config
 
-                riding_rows.append({'districtid': ridingid, 'party': party, 'votepercent': newvote})
-                resultsdict[party] = newvote
 
-            except:
-                continue
+def main(argv=None, default_baseline='current'):
+    args = build_parser(default_baseline).parse_args(argv)
+    strategy = get_baseline(args.baseline, **({'weights': args.weights} if args.weights else {}))
+    error_model = build_error_model(args)
 
-        # Determine riding winner
-        winner = max(resultsdict, key = resultsdict.get)
-        if winner == 'lpc':
-            lpcwins += 1
-        elif winner == 'cpc':
-            cpcwins += 1
-        elif winner == 'ndp':
-            ndpwins += 1
-        elif winner == 'gpc':
-            gpcwins += 1
-        elif winner == 'bq':
-            bqwins += 1
+    report = RunReport('election_model', show_progress=not args.no_progress)
+    try:
+        with report:
+            forecast(args, strategy, error_model, report)
+    finally:
+        report.write(args.report)
+        print("Stages: %s" % report.summary())
+
+
+def forecast(args, strategy, error_model, report):
+    start_time = time.time()
+    model = ForecastModel.load(strategy, use_cache=not args.no_baseline_cache)
+    if args.analytic:
+        run_analytic(args, model, strategy, start_time)
+        return
+
+    as_of = args.as_of or date.today()
+    chunk_size = args.chunk_size
+    if args.memory_budget_mb is not None:
+        chunk_size = chunk_size_for_budget(model.baseline, args.memory_budget_mb)
+    chunk_size = error_model.chunk_size(chunk_size, at_most=args.memory_budget_mb is not None)
+    config = run_config(args, error_model, chunk_size)
+    fingerprint, seed = model.fingerprint(args.sims, args.seed, as_of, args.regional, **config)
+
+    outputs = csv_outputs(with_se=args.adaptive)
+    if args.save_samples:
+        outputs += ['samples/' + name for name in SAMPLE_FILES]
+    detail('as_of_date', as_of.isoformat())
+    detail('fingerprint', fingerprint)
+    if args.skip_if_unchanged and is_current(RESULTS_DIR, fingerprint, outputs):
+        report.status = 'skipped'
+        print("Inputs unchanged (fingerprint %s), model results kept" % fingerprint[:12])
+        return
+
+    result = model.run(n_sims=args.sims, seed=seed, as_of_date=as_of, chunk_size=chunk_size, workers=args.workers,
+                       adaptive=args.adaptive, tolerance=args.tolerance, seat_tolerance=args.seat_tolerance,
+                       min_sims=args.min_sims, keep_samples=args.save_samples, error_model=error_model,
+                       regional=args.regional)
+    written = export_csv(result, RESULTS_DIR, with_se=args.adaptive)
+    if args.save_samples:
+        with stage('export'):
+            written += ['samples/' + name for name in save_samples(result, RESULTS_DIR / 'samples')]
+    detail('numsims', result.numsims)
+    detail('seed', result.seed)
+    write_manifest(RESULTS_DIR, fingerprint, written, mode='simulation', as_of_date=as_of, seed=result.seed,
+                   numsims=result.numsims, baseline=repr(strategy), baseline_key=model.baseline_key, config=config)
+    if args.history:
+        with stage('history'):
+            conn = sqlite3.connect(DB_PATH)
+            run_id = record_run(conn, result, fingerprint, dict(config, baseline=repr(strategy),
+                                                                baseline_key=model.baseline_key,
+                                                                regional=args.regional))
+            conn.close()
+        detail('history_run_id', run_id)
+
+    print("Baseline: %r, errors: %r, seed: %s, simulations: %d" % (strategy, error_model, result.seed, result.numsims))
+    print("Inputs fingerprint: %s" % fingerprint[:12])
+    if args.history:
+        print("Stored in forecast history as run %d" % run_id)
+    if args.regional:
+        print("Regional swing: %s" % (', '.join(result.regions) or 'no region has enough recent polls'))
+    if args.sampler != 'random':
+        efficiency = result.aggregates.variance_ratio()
+        if efficiency is None:
+            print("Variance ratio: needs at least 3 chunks")
         else:
-            ppcwins += 1
-
-        # Update global dataframe
-        dfridingprobabilities.loc[dfridingprobabilities.index[p], winner] = \
-            (dfridingprobabilities.loc[dfridingprobabilities.index[p], winner] + 1)
-        p += 1
-
-    # Build results DataFrame and normalize to 100% vote total per riding
-    dfridingresults = pd.DataFrame(riding_rows, columns=['districtid', 'party', 'votepercent'])
-    dfridingresults['votepercent'] = (dfridingresults['votepercent'] / dfridingresults.groupby('districtid')['votepercent'].transform('sum')) * 100
+            print("Variance ratio vs plain Monte Carlo: ridings %.2fx, seats %.2fx (effective simulations %.0f, %d chunks)"
+                  % (efficiency['riding_variance_ratio'], efficiency['seat_variance_ratio'],
+                     efficiency['effective_sims'], efficiency['chunks']))
+    print("Run time: %s seconds" % (time.time() - start_time))
 
-    global n
-    print("Simulation #" + str(n) + ": complete")
-    n += 1
-    return lpcwins, cpcwins, ndpwins, gpcwins, bqwins, ppcwins, dfridingresults
 
+def run_analytic(args, model, strategy, start_time):
+    '''
+    Closed-form forecast, optionally checked against a Monte Carlo run
+    '''
+    if args.error_model != 'independent':
+        raise SystemExit("--analytic assumes independent polling errors")
+    as_of = args.as_of or date.today()
+    forecast = model.run_analytic(as_of, args.regional)
+    fingerprint, _ = model.fingerprint(0, 0, as_of, args.regional, mode='analytic')
+    written = export_analytic_csv(forecast, RESULTS_DIR)
+    write_manifest(RESULTS_DIR, fingerprint, written, mode='analytic', as_of_date=as_of,
+                   baseline=repr(strategy), baseline_key=model.baseline_key)
+    print("Baseline: %r, analytic forecast" % (strategy,))
+    print("Run time: %s seconds" % (time.time() - start_time))
 
-#SimulateElection()
-SimulateMultipleElections(10000)
+    if args.check_sims:
+        result = model.run(n_sims=args.check_sims, seed=args.seed, as_of_date=as_of, chunk_size=args.chunk_size,
+                           workers=args.workers, regional=args.regional)
+        check = deviation_from(forecast, result)
+        print("Largest riding deviation from %d simulations: %.2f pp (FED_NUM %d, %s; Monte Carlo SE %.2f pp)"
+              % (result.numsims, check['max_riding_deviation_pp'], check['riding'], check['party'].upper(),
+                 check['monte_carlo_se_pp']))
+        print("Mean riding deviation: %.3f pp, largest mean seat deviation: %.2f seats"
+              % (check['mean_abs_riding_deviation_pp'], check['max_seat_mean_deviation']))
 
-######################################################################################################################
-# Execute script to update seat projections
-######################################################################################################################
-#exec(open('SeatProjectionGraphs.py').read())
 
-######################################################################################################################
-# Update GeoJSON
-######################################################################################################################
-#os.chdir("C://Users//Donovan//Documents//Visual Studio Code//ElectoralMap")
-#exec(open('exportgeojson.py').read())
+if __name__ == '__main__':
+    main()
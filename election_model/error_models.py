@@ -0,0 +1,222 @@
+"""
+error_models.py - Polling error samplers for the forecast engine.
+
+A sampler draws the standardized (sims x ridings x parties) polling error
+tensor for a whole batch at once; simulate_batch() scales it by
+MarginOfError / 2, so the weighted poll margin of error still sets the size of
+the error in every riding.
+
+    IndependentErrors()   one independent N(0, 1) draw per riding and party
+                          (the original AddErr() behaviour)
+    CorrelatedErrors()    a national miss shared by every riding, a regional
+                          miss shared within each region (see regions.py) and
+                          small riding noise, correlated across parties
+
+With independent draws each riding gets its own "national" polling miss, the
+misses average out over 343 ridings and seat distributions come out far too
+narrow. CorrelatedErrors keeps each riding's error at N(0, 1) (so its marginal
+sd is still MoE / 2) but moves ridings together.
+
+Both take a `sampler` for the underlying standard normals:
+
+    'random'      plain pseudo-random normals
+    'antithetic'  the second half of every chunk mirrors the first (-z)
+    'sobol'       scrambled Sobol points through the inverse normal CDF
+                  (needs scipy, imported only when used)
+
+Each chunk is an independent replicate (its own seed and scramble), so the
+variance actually achieved can be measured from the spread between chunks
+(see RunningAggregates.variance_ratio()). Sobol points are only balanced in
+runs of a power of 2, so ForecastModel.run() rounds the chunk size with
+ErrorModel.chunk_size() (1000 becomes 1024); a shorter last chunk still
+draws valid points, and scipy warns about it.
+"""
+
+import numpy as np
+
+from forecast_engine import PARTIES
+from regions import region_index
+
+# Share of the error variance that is national / regional / riding level
+DEFAULT_SPLIT = (0.6, 0.25, 0.15)
+
+# Correlation between the errors of any two parties: one party's gain is
+# mostly another's loss. Must keep the matrix positive definite (> -1/(P-1)).
+DEFAULT_PARTY_CORRELATION = -0.15
+
+
+class AntitheticNormals:
+    """Standard normals in antithetic pairs: each batch is z followed by -z."""
+
+    def __init__(self, rng):
+        self.rng = rng
+
+    def standard_normal(self, size):
+        half = self.rng.standard_normal(((size[0] + 1) // 2,) + tuple(size[1:]))
+        return np.concatenate([half, -half])[:size[0]]
+
+
+class SobolNormals:
+    """Scrambled Sobol points mapped to standard normals, one point per simulation.
+
+    Every standard_normal() call scrambles a fresh sequence from `rng`, so a
+    chunk's first axis runs along the sequence and the remaining axes are its
+    dimensions. Chunk sizes that are powers of 2 keep the sequence balanced
+    (see chunk_size()).
+    """
+
+    MAX_DIMENSIONS = 21201
+
+    def __init__(self, rng):
+        from scipy.special import ndtri
+        from scipy.stats import qmc
+        self.rng = rng
+        self._ndtri = ndtri
+        self._qmc = qmc
+
+    def standard_normal(self, size):
+        dimensions = int(np.prod(size[1:]))
+        if dimensions > self.MAX_DIMENSIONS:
+            raise ValueError(f"Sobol sampler supports at most {self.MAX_DIMENSIONS} dimensions, got {dimensions}")
+        engine = self._qmc.Sobol(dimensions, scramble=True, seed=self.rng)
+        points = engine.random(size[0])
+        eps = np.finfo(float).eps
+        return self._ndtri(np.clip(points, eps, 1 - eps)).reshape(size)
+
+    @staticmethod
+    def chunk_size(chunk_size, at_most=False):
+        """The power of 2 nearest `chunk_size` (with `at_most`, the largest one not above it)."""
+        exponent = np.log2(max(chunk_size, 1))
+        return 2 ** int(np.floor(exponent) if at_most else np.round(exponent))
+
+
+SAMPLERS = {
+    'random': None,
+    'antithetic': AntitheticNormals,
+    'sobol': SobolNormals,
+}
+
+
+def check_sampler(sampler):
+    """Validate a sampler name, importing scipy up front for 'sobol'."""
+    if sampler not in SAMPLERS:
+        raise ValueError(f"Unknown sampler {sampler!r}; choose from {sorted(SAMPLERS)}")
+    if sampler == 'sobol':
+        try:
+            import scipy.stats  # noqa: F401
+        except ImportError:
+            raise ImportError("The sobol sampler needs scipy (pip install scipy)") from None
+    return sampler
+
+
+class ErrorModel:
+    """Base class: draws its standard normals through the configured sampler."""
+
+    name = None
+
+    def __init__(self, sampler='random'):
+        self.sampler = check_sampler(sampler)
+
+    def normals(self, rng):
+        """`rng`, or a sampler wrapping it with the same standard_normal(size) interface."""
+        factory = SAMPLERS[self.sampler]
+        return rng if factory is None else factory(rng)
+
+    def chunk_size(self, chunk_size, at_most=False):
+        """Simulations per chunk that suit the sampler, near `chunk_size` (not above it with `at_most`)."""
+        factory = SAMPLERS[self.sampler]
+        if factory is None or not hasattr(factory, 'chunk_size'):
+            return chunk_size
+        return factory.chunk_size(chunk_size, at_most)
+
+    def sample(self, rng, numsims, baseline):
+        raise NotImplementedError
+
+    def options(self):
+        """Keyword arguments that rebuild this model with get_error_model(self.name, **options)."""
+        return {'sampler': self.sampler}
+
+    def _describe(self):
+        return {} if self.sampler == 'random' else {'sampler': self.sampler}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{k}={v}' for k, v in self._describe().items())})"
+
+
+class IndependentErrors(ErrorModel):
+    """Independent standard normal error per riding and party."""
+
+    name = 'independent'
+
+    def sample(self, rng, numsims, baseline):
+        return self.normals(rng).standard_normal((numsims, baseline.num_ridings, baseline.num_parties))
+
+
+class CorrelatedErrors(ErrorModel):
+    """National + regional + riding error components, correlated across parties.
+
+    `split` gives the share of the variance at each level and must sum to 1,
+    so every riding's error stays standard normal. `party_correlation` is a
+    single correlation for every pair of parties or a full (P, P) matrix; its
+    Cholesky factor is computed once and applied to all three components.
+    """
+
+    name = 'correlated'
+
+    def __init__(self, split=DEFAULT_SPLIT, party_correlation=DEFAULT_PARTY_CORRELATION, sampler='random'):
+        super().__init__(sampler)
+        split = np.asarray(split, dtype=float)
+        if split.shape != (3,) or (split < 0).any() or not np.isclose(split.sum(), 1):
+            raise ValueError(f"Error split must be three non-negative shares summing to 1, got {split.tolist()}")
+        self.split = split
+
+        num_parties = len(PARTIES)
+        correlation = np.asarray(party_correlation, dtype=float)
+        if correlation.ndim == 0:
+            correlation = np.full((num_parties, num_parties), float(correlation))
+            np.fill_diagonal(correlation, 1)
+        try:
+            self.cholesky = np.linalg.cholesky(correlation)
+        except np.linalg.LinAlgError:
+            raise ValueError("Party correlation matrix must be positive definite") from None
+        self.party_correlation = correlation
+        self._regions = None
+
+    def _region_index(self, baseline):
+        """Region index of the baseline's ridings, worked out once per baseline."""
+        if self._regions is None or self._regions[0] is not baseline.provinces:
+            self._regions = (baseline.provinces,) + region_index(baseline.provinces)
+        return self._regions[1:]
+
+    def sample(self, rng, numsims, baseline):
+        index, names = self._region_index(baseline)
+        rng = self.normals(rng)
+        num_parties = len(PARTIES)
+        national, regional, riding = np.sqrt(self.split)
+
+        draws = riding * rng.standard_normal((numsims, baseline.num_ridings, num_parties))
+        draws += regional * rng.standard_normal((numsims, len(names), num_parties))[:, index]
+        draws += national * rng.standard_normal((numsims, 1, num_parties))
+        return draws @ self.cholesky.T
+
+    def options(self):
+        return {'split': self.split.tolist(), 'party_correlation': self.party_correlation.tolist(),
+                **super().options()}
+
+    def _describe(self):
+        return {'split': self.split.tolist(), **super()._describe()}
+
+
+ERROR_MODELS = {
+    'independent': IndependentErrors,
+    'correlated': CorrelatedErrors,
+}
+
+
+def get_error_model(model=None, **kwargs):
+    """Resolve an error model name or instance (None: independent errors)."""
+    if model is None:
+        return IndependentErrors()
+    if isinstance(model, str):
+        return ERROR_MODELS[model](**kwargs)
+    return model
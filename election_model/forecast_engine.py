@@ -0,0 +1,498 @@
+"""
+forecast_engine.py - Vectorized Monte Carlo engine for the election model.
+
+The riding baseline is held as a padded riding x party matrix with a presence
+mask, so a whole batch of elections is simulated with array operations over a
+(sims x ridings x parties) tensor instead of per-riding, per-party Python loops.
+
+The maths matches the original SimulateElection() loop:
+    newvote = vote + ((poll + err - natvote) / natvote) * vote,  clipped at 0
+with err ~ N(0, 1) / 2 * MarginOfError drawn independently per riding and party,
+or from a correlated error model (see error_models.py).
+"""
+
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+from accumulators import ShareAccumulator
+
+# Party axis shared by every matrix in the engine (and the CSV column order)
+PARTIES = ['lpc', 'cpc', 'ndp', 'gpc', 'bq', 'ppc']
+
+# Default number of simulations drawn per array operation. Together with the
+# seed this fixes the random stream, so keep it unchanged to reproduce a run.
+BATCH_SIZE = 1000
+
+
+@dataclass
+class Baseline:
+    """Riding x party baseline used by the engine.
+
+    riding_ids  (R,)    FED_NUM of each riding, sorted ascending
+    shares      (R, P)  baseline vote share, 0 where the party did not run
+    present     (R, P)  True where the party has a baseline share in the riding
+    national    (P,)    national baseline vote share, NaN if unknown
+    provinces   (R,)    province code of each riding ('' if unknown)
+    votes       (R,)    votes cast in each riding, to weight ridings in regional
+                        shares (1 each if unknown)
+    """
+    riding_ids: np.ndarray
+    shares: np.ndarray
+    present: np.ndarray
+    national: np.ndarray
+    provinces: np.ndarray = None
+    votes: np.ndarray = None
+
+    def __post_init__(self):
+        if self.provinces is None:
+            self.provinces = np.full(len(self.riding_ids), '')
+        if self.votes is None:
+            self.votes = np.ones(len(self.riding_ids))
+
+    @property
+    def num_ridings(self):
+        return len(self.riding_ids)
+
+    @property
+    def num_parties(self):
+        return self.shares.shape[1]
+
+
+def build_baseline(riding_rows, national_shares, provinces=None, votes=None):
+    """Build a Baseline from (id, party, votepercent) rows and a {party: share} dict.
+
+    `provinces` optionally maps riding id to province code, and `votes` riding
+    id to the number of votes cast there.
+
+    Parties outside PARTIES (e.g. 'other') are dropped, matching the original
+    loop which skipped any party without a polling average.
+    """
+    df = pd.DataFrame(riding_rows, columns=['id', 'party', 'votepercent'])
+    df['party'] = df['party'].str.lower()
+    riding_ids = np.sort(df['id'].unique())
+
+    df = df[df['party'].isin(PARTIES)]
+    rows = np.searchsorted(riding_ids, df['id'].to_numpy())
+    cols = df['party'].map({p: j for j, p in enumerate(PARTIES)}).to_numpy()
+
+    shares = np.zeros((len(riding_ids), len(PARTIES)))
+    present = np.zeros(shares.shape, dtype=bool)
+    shares[rows, cols] = df['votepercent'].astype(float).to_numpy()
+    present[rows, cols] = True
+
+    national_shares = {k.lower(): v for k, v in national_shares.items()}
+    national = np.array([
+        np.nan if national_shares.get(p) is None else float(national_shares[p])
+        for p in PARTIES
+    ])
+    provinces = provinces or {}
+    province_codes = np.array([provinces.get(rid) or '' for rid in riding_ids.tolist()])
+    riding_votes = None
+    if votes is not None:
+        riding_votes = np.array([float(votes.get(rid) or 0) for rid in riding_ids.tolist()])
+    return Baseline(riding_ids, shares, present, national, province_codes, riding_votes)
+
+
+def party_vector(values):
+    """Convert a {party: value} dict to a (P,) array on the engine's party axis."""
+    return np.array([
+        np.nan if values.get(p) is None else float(values[p]) for p in PARTIES
+    ])
+
+
+def contesting_mask(baseline, poll_averages):
+    """(R, P) mask of parties that take part in the simulation of each riding.
+
+    A party needs a baseline share, a usable national baseline and a polling
+    average. The original loop raised (and skipped the party) on a missing or
+    zero national share; a NaN polling average produced NaN vote shares that
+    never counted towards the riding total, so those parties are excluded too.
+    """
+    national_ok = np.isfinite(baseline.national) & (baseline.national != 0)
+    poll_ok = np.isfinite(poll_averages)
+    return baseline.present & national_ok & poll_ok
+
+
+def simulate_batch(baseline, poll_averages, margin_of_error, numsims, rng=None, draws=None, error_model=None):
+    """Simulate `numsims` elections at once.
+
+    `draws` optionally supplies the (n, R, P) standard normal error draws
+    instead of taking them from `rng`, so several baselines or poll scenarios
+    can be evaluated on common random numbers. Otherwise they come from
+    `error_model.sample(rng, numsims, baseline)`, or are independent per
+    riding and party if no error model is given.
+
+    Returns
+        seats    (n, P)     seats won by each party in each simulation
+        winners  (n, R)     index into PARTIES of each riding's winner
+        shares   (n, R, P)  normalized vote share (percent), NaN where not contesting
+    """
+    mask = contesting_mask(baseline, poll_averages)
+    num_parties = baseline.num_parties
+
+    if draws is None:
+        if rng is None:
+            rng = np.random.default_rng()
+        if error_model is None:
+            draws = rng.standard_normal((numsims, baseline.num_ridings, num_parties))
+        else:
+            draws = error_model.sample(rng, numsims, baseline)
+    pollwerr = poll_averages + draws / 2 * margin_of_error
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        propchange = (pollwerr - baseline.national) / baseline.national
+        newvote = baseline.shares + propchange * baseline.shares
+    np.maximum(newvote, 0, out=newvote)
+    newvote[:, ~mask] = np.nan
+
+    # Riding winner is taken on the unnormalized shares, as in the original loop
+    winners = np.argmax(np.where(mask, newvote, -np.inf), axis=2)
+    seats = np.stack([(winners == j).sum(axis=1) for j in range(num_parties)], axis=1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        shares = newvote / np.nansum(newvote, axis=2, keepdims=True) * 100
+    return seats, winners, shares
+
+
+def simulate_winners(baseline, poll_averages, margin_of_error, draws, chunk_size=250):
+    """Seats and riding winners for pre-drawn (n, R, P) errors, without vote shares.
+
+    Same maths as simulate_batch() rearranged as vote / natvote * (poll + err)
+    and run in float32 over small chunks, for re-evaluating a cached set of
+    draws under many poll scenarios (see scenarios.py).
+
+    Returns (seats (n, P), winners (n, R) uint8).
+    """
+    mask = contesting_mask(baseline, poll_averages)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        scale = np.where(mask, baseline.shares / baseline.national, 0).astype(np.float32)
+    polls = np.where(mask, poll_averages, 0).astype(np.float32)
+    # Parties not contesting score -1, below any clipped vote
+    offset = np.where(mask, 0, -1).astype(np.float32)
+    half_moe = np.float32(margin_of_error / 2)
+
+    numsims = len(draws)
+    winners = np.empty((numsims, baseline.num_ridings), dtype=np.uint8)
+    for start in range(0, numsims, chunk_size):
+        newvote = draws[start:start + chunk_size] * half_moe
+        newvote += polls
+        newvote *= scale
+        np.maximum(newvote, 0, out=newvote)
+        newvote += offset
+        winners[start:start + chunk_size] = newvote.argmax(axis=2)
+
+    num_parties = baseline.num_parties
+    codes = winners + np.arange(numsims)[:, None] * num_parties
+    seats = np.bincount(codes.ravel(), minlength=numsims * num_parties).reshape(numsims, num_parties)
+    return seats, winners
+
+
+def riding_win_counts(winners, num_parties=len(PARTIES)):
+    """(R, P) count of simulations each party won each riding."""
+    return np.stack([(winners == j).sum(axis=0) for j in range(num_parties)], axis=1)
+
+
+def chunk_size_for_budget(baseline, memory_budget_mb):
+    """Largest chunk of simulations whose working tensors fit in `memory_budget_mb`.
+
+    simulate_batch() keeps roughly six float64 (sims x ridings x parties)
+    tensors alive at its peak (draws, intermediate votes, shares, masks).
+    """
+    bytes_per_sim = 6 * 8 * baseline.num_ridings * baseline.num_parties
+    return max(1, int(memory_budget_mb * 1024 ** 2 // bytes_per_sim))
+
+
+class RunningAggregates:
+    """Running totals for a simulation run, folded in one chunk at a time.
+
+    Everything the CSV outputs need is kept in O(ridings x parties) memory, so
+    peak memory does not depend on the total number of simulations. Each
+    add() also records that chunk's win rates and mean seats as one
+    replicate, for variance_ratio().
+    """
+
+    def __init__(self, baseline):
+        num_parties = baseline.num_parties
+        shape = (baseline.num_ridings, num_parties)
+        self.numsims = 0
+        self.seat_sum = np.zeros(num_parties, dtype=np.int64)
+        self.seat_min = np.full(num_parties, np.iinfo(np.int64).max)
+        self.seat_max = np.full(num_parties, np.iinfo(np.int64).min)
+        self.win_counts = np.zeros(shape, dtype=np.int64)
+        self.seats = ShareAccumulator(num_parties)
+        self.shares = ShareAccumulator(shape)
+        self.chunk_win_rates = ShareAccumulator(shape)
+        self.chunk_seat_means = ShareAccumulator(num_parties)
+
+    def add(self, seats, winners, shares):
+        """Fold one chunk of simulate_batch() output into the totals."""
+        self.numsims += len(seats)
+        self.seat_sum += seats.sum(axis=0)
+        np.minimum(self.seat_min, seats.min(axis=0), out=self.seat_min)
+        np.maximum(self.seat_max, seats.max(axis=0), out=self.seat_max)
+        win_counts = riding_win_counts(winners, len(self.seat_sum))
+        self.win_counts += win_counts
+        self.seats.update(seats.astype(float))
+        self.shares.update(shares)
+        self.chunk_win_rates.update((win_counts / len(seats))[None])
+        self.chunk_seat_means.update(seats.mean(axis=0)[None])
+
+    def merge(self, other):
+        """Merge the totals of another run over the same baseline into this one."""
+        self.numsims += other.numsims
+        self.seat_sum += other.seat_sum
+        np.minimum(self.seat_min, other.seat_min, out=self.seat_min)
+        np.maximum(self.seat_max, other.seat_max, out=self.seat_max)
+        self.win_counts += other.win_counts
+        self.seats.merge(other.seats)
+        self.shares.merge(other.shares)
+        self.chunk_win_rates.merge(other.chunk_win_rates)
+        self.chunk_seat_means.merge(other.chunk_seat_means)
+        return self
+
+    def win_probability_se(self):
+        """(R, P) Monte Carlo standard error of each riding win probability, in percentage points."""
+        p = self.win_counts / self.numsims
+        return np.sqrt(p * (1 - p) / self.numsims) * 100
+
+    def seat_mean_se(self):
+        """(P,) Monte Carlo standard error of each party's mean seat count."""
+        return self.seats.std(ddof=1) / np.sqrt(self.numsims)
+
+    def variance_ratio(self):
+        """How many times less variance the run achieved than plain Monte Carlo.
+
+        The achieved variance of a chunk's estimate is measured from the spread
+        between chunks (independent replicates) and compared with what
+        independent draws would give: p(1 - p) / chunk size for riding win
+        rates, the seat count variance / chunk size for mean seats. Returns the
+        median ratio over the ridings whose outcome is uncertain (5-95%) and
+        over the parties' seat means, and the effective number of plain
+        simulations, or None with fewer than 3 chunks.
+        """
+        chunks = int(self.chunk_seat_means.count.max(initial=0))
+        if chunks < 3:
+            return None
+        size = self.numsims / chunks
+        p = self.win_counts / self.numsims
+        with np.errstate(invalid='ignore', divide='ignore'):
+            riding = p * (1 - p) / (size * self.chunk_win_rates.std(ddof=1) ** 2)
+            seat = self.seats.std(ddof=1) ** 2 / (size * self.chunk_seat_means.std(ddof=1) ** 2)
+        riding = riding[(p > 0.05) & (p < 0.95) & np.isfinite(riding)]
+        seat = seat[np.isfinite(seat)]
+        riding_ratio = float(np.median(riding)) if len(riding) else float('nan')
+        return {
+            'chunks': chunks,
+            'riding_variance_ratio': riding_ratio,
+            'seat_variance_ratio': float(np.median(seat)) if len(seat) else float('nan'),
+            'effective_sims': self.numsims * riding_ratio,
+        }
+
+    def share_stats(self, ddof=4):
+        """Per riding/party mean and standard deviation of simulated vote shares.
+
+        NaN cells (party not contesting) are ignored. `ddof=4` reproduces the
+        groupby(...).std(ddof=4) used by the original model.
+        """
+        return self.shares.means(), self.shares.std(ddof)
+
+
+# ── Chunked / parallel runs ──────────────────────────────────────────────────
+
+# Per-process copy of the simulation inputs, set once by the pool initializer
+_worker_inputs = None
+
+
+def _init_worker(baseline, poll_averages, margin_of_error, error_model=None):
+    global _worker_inputs
+    _worker_inputs = (baseline, poll_averages, margin_of_error, error_model)
+
+
+def _simulate_chunk(numsims, seed_seq, inputs=None):
+    """Simulate one chunk with its own Generator.
+
+    Returns (aggregates, seats, winners, timings), timings being the
+    (wall, cpu) seconds spent simulating and aggregating, for the run report.
+    """
+    baseline, poll_averages, margin_of_error, error_model = inputs or _worker_inputs
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    rng = np.random.default_rng(seed_seq)
+    seats, winners, shares = simulate_batch(baseline, poll_averages, margin_of_error, numsims, rng,
+                                            error_model=error_model)
+    simulated_wall, simulated_cpu = time.perf_counter(), time.process_time()
+    aggregates = RunningAggregates(baseline)
+    aggregates.add(seats, winners, shares)
+    timings = ((simulated_wall - start_wall, simulated_cpu - start_cpu),
+               (time.perf_counter() - simulated_wall, time.process_time() - simulated_cpu))
+    return aggregates, seats, winners.astype(np.uint8), timings
+
+
+@contextmanager
+def _worker_pool(workers, inputs):
+    """Process pool primed with the simulation inputs, or None to run in-process."""
+    if workers > 1:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=inputs) as pool:
+            yield pool
+    else:
+        yield None
+
+
+def _run_chunks(pool, inputs, sizes, seed_seq, aggregates, on_chunk, progress=None):
+    """Simulate one chunk per entry of `sizes` and merge them, in order, into `aggregates`.
+
+    Child seeds are spawned from `seed_seq` as chunks are scheduled, so splitting
+    a run over several calls draws exactly the same streams as a single call.
+    Chunk timings go to the 'simulate' and 'aggregate' stages of the active
+    run report (see instrumentation.py), summed over chunks and workers.
+    """
+    children = seed_seq.spawn(len(sizes))
+    if pool is None:
+        results = (_simulate_chunk(size, child, inputs) for size, child in zip(sizes, children))
+    else:
+        results = pool.map(_simulate_chunk, sizes, children)
+    for chunk_aggregates, seats, winners, (simulate_time, aggregate_time) in results:
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        aggregates.merge(chunk_aggregates)
+        in_process = pool is None
+        instrumentation.record('simulate', *simulate_time, items=len(seats), memory=in_process)
+        instrumentation.record('aggregate', aggregate_time[0] + time.perf_counter() - start_wall,
+                               aggregate_time[1] + time.process_time() - start_cpu, items=len(seats),
+                               memory=in_process)
+        if progress is not None:
+            progress.update(len(seats))
+        if on_chunk is not None:
+            on_chunk(seats, winners)
+
+
+def run_simulations(baseline, poll_averages, margin_of_error, numsims, chunk_size=BATCH_SIZE,
+                    seed=None, workers=1, on_chunk=None, error_model=None):
+    """Simulate `numsims` elections in chunks, optionally across a process pool.
+
+    Every chunk gets its own Generator from a SeedSequence spawned off `seed`,
+    and the per-chunk aggregates are merged in chunk order. Given the same seed
+    and chunk size the result is therefore bit-identical for any worker count.
+    `on_chunk(seats, winners)` is called with each chunk's (n, P) seat counts
+    and (n, R) uint8 riding winner codes, in order. `error_model` is passed
+    on to simulate_batch().
+
+    Returns (aggregates, seed_sequence); seed_sequence.entropy reproduces the run.
+    """
+    seed_seq = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    sizes = [min(chunk_size, numsims - start) for start in range(0, numsims, chunk_size)]
+    inputs = (baseline, poll_averages, margin_of_error, error_model)
+
+    aggregates = RunningAggregates(baseline)
+    progress = instrumentation.progress(numsims, 'simulations')
+    with _worker_pool(workers, inputs) as pool:
+        _run_chunks(pool, inputs, sizes, seed_seq, aggregates, on_chunk, progress)
+    progress.close()
+    return aggregates, seed_seq
+
+
+# Chunks simulated between convergence checks in run_adaptive()
+ADAPTIVE_ROUND_CHUNKS = 4
+
+
+def run_adaptive(baseline, poll_averages, margin_of_error, tolerance=0.5, seat_tolerance=0.25,
+                 min_sims=2000, max_sims=100000, chunk_size=BATCH_SIZE, seed=None, workers=1,
+                 on_chunk=None, error_model=None):
+    """Simulate in rounds of chunks until the Monte Carlo error is within tolerance.
+
+    Stops once every riding win probability has a standard error of at most
+    `tolerance` percentage points and every mean seat count one of at most
+    `seat_tolerance` seats, but never before `min_sims` or after `max_sims`.
+    A round is ADAPTIVE_ROUND_CHUNKS chunks, spread over the pool, so the
+    stopping point (and the result) depends only on the seed and chunk size,
+    not on the worker count.
+
+    Returns (aggregates, seed_sequence) like run_simulations().
+    """
+    seed_seq = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    inputs = (baseline, poll_averages, margin_of_error, error_model)
+
+    aggregates = RunningAggregates(baseline)
+    progress = instrumentation.progress(max_sims, 'simulations (at most)')
+    with _worker_pool(workers, inputs) as pool:
+        while aggregates.numsims < max_sims:
+            remaining = max_sims - aggregates.numsims
+            if aggregates.numsims < min_sims:
+                remaining = min(remaining, min_sims - aggregates.numsims)
+            else:
+                remaining = min(remaining, chunk_size * ADAPTIVE_ROUND_CHUNKS)
+            sizes = [min(chunk_size, remaining - start) for start in range(0, remaining, chunk_size)]
+            _run_chunks(pool, inputs, sizes, seed_seq, aggregates, on_chunk, progress)
+
+            if (aggregates.numsims >= min_sims
+                    and aggregates.win_probability_se().max() <= tolerance
+                    and aggregates.seat_mean_se().max() <= seat_tolerance):
+                break
+    progress.close()
+    return aggregates, seed_seq
+
+
+# ── CSV export ───────────────────────────────────────────────────────────────
+
+def seat_stats(aggregates, with_se=False):
+    """max / min / mean seat count per party (seatstats.csv layout).
+
+    `with_se` adds a mean_se column with the Monte Carlo standard error of the mean.
+    """
+    seatprojectionstats = pd.DataFrame(index=PARTIES)
+    seatprojectionstats['max'] = aggregates.seat_max
+    seatprojectionstats['min'] = aggregates.seat_min
+    seatprojectionstats['mean'] = aggregates.seat_sum / aggregates.numsims
+    if with_se:
+        seatprojectionstats['mean_se'] = aggregates.seat_mean_se().round(3)
+    return seatprojectionstats
+
+
+def riding_probabilities(baseline, win_counts, numsims):
+    """Percent of simulations each party won each riding (ridingprobabilities.csv layout)."""
+    dfridingprobabilities = pd.DataFrame(
+        np.round(win_counts / numsims * 100, 1),
+        index=pd.Index(baseline.riding_ids, name='FED_NUM'),
+        columns=PARTIES,
+    )
+    return dfridingprobabilities.rename(columns={
+        'lpc': 'LPCwins', 'cpc': 'CPCwins', 'ndp': 'NDPwins',
+        'gpc': 'GPCwins', 'bq': 'BQwins', 'ppc': 'PPCwins'
+    })
+
+
+def riding_probability_se(baseline, aggregates):
+    """Standard error of each riding win probability in percentage points (ridingprobabilities_se.csv)."""
+    dfridingprobabilities = riding_probabilities(baseline, aggregates.win_counts, aggregates.numsims)
+    dfridingprobabilities[:] = aggregates.win_probability_se().round(2)
+    return dfridingprobabilities
+
+
+def riding_vote_percents(baseline, mean, std):
+    """Mean and 2x std vote share per riding (ridingvotepercents.csv layout).
+
+    Every party with a baseline share somewhere gets a mean and a std column
+    (sorted by name). Each 2x std is capped at the party's mean so the lower
+    bound never goes below 0.
+    """
+    ran = baseline.present.any(axis=0) & np.isfinite(baseline.national) & (baseline.national != 0)
+    kept = [p for p, r in zip(PARTIES, ran) if r]
+    index = pd.Index(baseline.riding_ids, name='districtid')
+    dfridingpercentagesavg = pd.DataFrame(mean, index=index, columns=PARTIES)[kept].sort_index(axis=1).round(1)
+    dfridingpercentagesstd = pd.DataFrame(std * 2, index=index, columns=PARTIES)[kept].sort_index(axis=1).round(1)
+    if 'ppc' not in dfridingpercentagesavg:
+        dfridingpercentagesavg['ppc'] = np.nan
+
+    for party in dfridingpercentagesstd.columns:
+        dfridingpercentagesstd[party] = dfridingpercentagesstd[party].clip(upper=dfridingpercentagesavg[party])
+
+    dfridingpercentagesstd = dfridingpercentagesstd.rename(columns={
+        'bq': 'bqstd', 'cpc': 'cpcstd', 'gpc': 'gpcstd',
+        'lpc': 'lpcstd', 'ndp': 'ndpstd', 'ppc': 'ppcstd'
+    })
+    masterdf = pd.merge(dfridingpercentagesavg, dfridingpercentagesstd, on='districtid', how='left')
+    return masterdf.fillna(0)
@@ -0,0 +1,242 @@
+"""
+forecast_history.py - Past forecast runs, kept in election_database.db.
+
+    run_id = record_run(conn, result, fingerprint, config)
+    past = load_run(conn, as_of=date(2026, 8, 20))
+    past.seat_summary, past.riding_probabilities()
+
+Each run is one forecast_runs row (when it ran, the forecast date, inputs
+fingerprint, seed and configuration) with two child tables:
+    forecast_seat_summary         one row per party: poll average, mean, p05,
+                                  p50, p95 seats, P(majority), P(most seats)
+    forecast_riding_probabilities one row per run: riding ids and the (R, P)
+                                  riding win counts as zlib-packed arrays
+Win counts are stored exactly (uint32), so ridingprobabilities.csv can be
+rebuilt as it was written, and riding ids as differences from the previous
+id, which compress to almost nothing. A daily forecast takes under 2 KB, so
+years of history fit in the database.
+
+load_run() reads a run with one query: the forecast_runs (as_of, run_id)
+index finds the latest run for the date, then the child rows are read by
+primary key. A day skipped as unchanged (--skip-if-unchanged) has no run of
+its own, and load_run(as_of=day) returns the last run on or before it,
+which is the forecast that was in effect.
+"""
+
+import json
+import sqlite3
+import sys
+import zlib
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from forecast_engine import PARTIES, riding_probabilities
+
+SEAT_QUANTILES = (5, 50, 95)
+
+SUMMARY_COLUMNS = ['poll', 'mean'] + [f'p{q:02d}' for q in SEAT_QUANTILES] + ['majority', 'most_seats']
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS forecast_runs (
+        run_id          INTEGER PRIMARY KEY,
+        created         TEXT NOT NULL,
+        as_of           TEXT NOT NULL CHECK (as_of = date(as_of)),
+        fingerprint     TEXT NOT NULL,
+        seed            TEXT,
+        numsims         INTEGER NOT NULL,
+        margin_of_error REAL,
+        config          TEXT NOT NULL,
+        UNIQUE (fingerprint, as_of)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_forecast_runs_as_of ON forecast_runs (as_of, run_id)",
+    """
+    CREATE TABLE IF NOT EXISTS forecast_seat_summary (
+        run_id      INTEGER NOT NULL REFERENCES forecast_runs (run_id) ON DELETE CASCADE,
+        party       TEXT NOT NULL,
+        poll        REAL,
+        mean        REAL NOT NULL,
+        p05         REAL NOT NULL,
+        p50         REAL NOT NULL,
+        p95         REAL NOT NULL,
+        majority    REAL NOT NULL,
+        most_seats  REAL NOT NULL,
+        PRIMARY KEY (run_id, party)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS forecast_riding_probabilities (
+        run_id          INTEGER PRIMARY KEY REFERENCES forecast_runs (run_id) ON DELETE CASCADE,
+        parties         TEXT NOT NULL,
+        riding_ids      BLOB NOT NULL,
+        win_counts      BLOB NOT NULL
+    )
+    """,
+]
+
+
+def ensure_schema(conn):
+    for ddl in SCHEMA:
+        conn.execute(ddl)
+
+
+def pack(values, dtype):
+    """zlib-compressed little-endian bytes of `values` as `dtype`."""
+    return zlib.compress(np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder('<')).tobytes(), 9)
+
+
+def unpack(blob, dtype, shape=None):
+    values = np.frombuffer(zlib.decompress(blob), dtype=np.dtype(dtype).newbyteorder('<')).astype(dtype)
+    return values if shape is None else values.reshape(shape)
+
+
+def seat_summary(seats, baseline):
+    """(P, 6) mean, p05, p50, p95 seats, P(majority) and P(most seats) in percent, from (n, P) seats.
+
+    A majority is more than half of the baseline's ridings; most seats means
+    strictly more than any other party, as in SampleStore.
+    """
+    majority_seats = baseline.num_ridings // 2 + 1
+    top = seats.max(axis=1, keepdims=True)
+    sole_top = (seats == top).sum(axis=1, keepdims=True) == 1
+    return np.column_stack([
+        seats.mean(axis=0),
+        np.percentile(seats, SEAT_QUANTILES, axis=0).T,
+        (seats >= majority_seats).mean(axis=0) * 100,
+        ((seats == top) & sole_top).mean(axis=0) * 100,
+    ])
+
+
+@dataclass
+class StoredForecast:
+    """A forecast read back from the history tables.
+
+    seat_summary  DataFrame indexed by party, SUMMARY_COLUMNS
+    riding_ids    (R,) FED_NUM of each riding
+    win_counts    (R, P) simulations each party won each riding
+    config        the run's configuration (baseline, error model, ...)
+    """
+    run_id: int
+    created: str
+    as_of: date
+    fingerprint: str
+    seed: str
+    numsims: int
+    margin_of_error: float
+    config: dict
+    seat_summary: pd.DataFrame
+    riding_ids: np.ndarray
+    win_counts: np.ndarray
+
+    def riding_probabilities(self):
+        """Win percent per riding and party, as the run wrote ridingprobabilities.csv."""
+        return riding_probabilities(SimpleNamespace(riding_ids=self.riding_ids), self.win_counts, self.numsims)
+
+
+def record_run(conn, result, fingerprint, config):
+    """Add a ForecastResult to the history; returns its run_id.
+
+    A run is stored once per fingerprint and forecast date: rerunning a date
+    with the same inputs returns the stored run_id. The fingerprint does not
+    include the date, so a later date whose poll averages happen to match an
+    earlier one's gets its own run, and load_run() finds it under its date.
+    """
+    ensure_schema(conn)
+    existing = conn.execute("SELECT run_id FROM forecast_runs WHERE fingerprint = ? AND as_of = ?",
+                            (fingerprint, result.as_of_date.isoformat())).fetchone()
+    if existing:
+        return existing[0]
+
+    stats = seat_summary(result.seats, result.baseline)
+    summary = np.column_stack([result.poll_averages, np.round(stats, 2)])
+    with conn:
+        cursor = conn.execute(
+            """
+            INSERT INTO forecast_runs (created, as_of, fingerprint, seed, numsims, margin_of_error, config)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (datetime.now(timezone.utc).isoformat(timespec='seconds'), result.as_of_date.isoformat(),
+             fingerprint, str(result.seed), int(result.numsims), float(result.margin_of_error),
+             json.dumps(config, sort_keys=True, default=str)),
+        )
+        run_id = cursor.lastrowid
+        conn.executemany(
+            f"INSERT INTO forecast_seat_summary (run_id, party, {', '.join(SUMMARY_COLUMNS)}) "
+            f"VALUES (?, ?, {', '.join('?' * len(SUMMARY_COLUMNS))})",
+            [(run_id, party, *[None if np.isnan(v) else float(v) for v in row])
+             for party, row in zip(PARTIES, summary)],
+        )
+        conn.execute(
+            "INSERT INTO forecast_riding_probabilities (run_id, parties, riding_ids, win_counts) VALUES (?, ?, ?, ?)",
+            (run_id, ','.join(PARTIES), pack(np.diff(result.baseline.riding_ids, prepend=0), np.int32),
+             pack(result.aggregates.win_counts, np.uint32)),
+        )
+    return run_id
+
+
+def load_run(conn, as_of=None, run_id=None):
+    """The run `run_id`, or the latest run forecasting `as_of` or an earlier date (default: the latest run).
+
+    Returns a StoredForecast, or None if there is no such run.
+    """
+    if run_id is not None:
+        where, params = "run_id = ?", (run_id,)
+    elif as_of is not None:
+        where, params = "as_of <= ? ORDER BY as_of DESC, run_id DESC LIMIT 1", (str(as_of),)
+    else:
+        where, params = "1 ORDER BY as_of DESC, run_id DESC LIMIT 1", ()
+    try:
+        rows = conn.execute(
+            f"""
+            SELECT r.run_id, r.created, r.as_of, r.fingerprint, r.seed, r.numsims, r.margin_of_error, r.config,
+                   p.parties, p.riding_ids, p.win_counts,
+                   s.party, {', '.join('s.' + c for c in SUMMARY_COLUMNS)}
+            FROM forecast_runs AS r
+            JOIN forecast_riding_probabilities AS p ON p.run_id = r.run_id
+            JOIN forecast_seat_summary AS s ON s.run_id = r.run_id
+            WHERE r.run_id = (SELECT run_id FROM forecast_runs WHERE {where})
+            """,
+            params,
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return None  # no history tables yet
+    if not rows:
+        return None
+
+    run_id, created, as_of, fingerprint, seed, numsims, margin_of_error, config, parties, ids, counts = rows[0][:11]
+    parties = parties.split(',')
+    riding_ids = np.cumsum(unpack(ids, np.int32))
+    win_counts = unpack(counts, np.uint32, (len(riding_ids), len(parties))).astype(np.int64)
+    summary = pd.DataFrame([row[12:] for row in rows], index=pd.Index([row[11] for row in rows], name='party'),
+                           columns=SUMMARY_COLUMNS).reindex(parties)
+    return StoredForecast(run_id, created, date.fromisoformat(as_of), fingerprint, seed, numsims,
+                          margin_of_error, json.loads(config), summary, riding_ids, win_counts)
+
+
+def list_runs(conn):
+    """DataFrame of every stored run (without the per-party and per-riding data), oldest first."""
+    try:
+        return pd.read_sql_query("SELECT run_id, created, as_of, fingerprint, seed, numsims, margin_of_error "
+                                 "FROM forecast_runs ORDER BY as_of, run_id", conn)
+    except (sqlite3.OperationalError, pd.errors.DatabaseError):
+        return pd.DataFrame(columns=['run_id', 'created', 'as_of', 'fingerprint', 'seed', 'numsims',
+                                     'margin_of_error'])
+
+
+if __name__ == '__main__':
+    from forecast_model import DB_PATH
+
+    conn = sqlite3.connect(DB_PATH)
+    stored = load_run(conn, as_of=sys.argv[1] if len(sys.argv) > 1 else None)
+    if stored is None:
+        print("No stored forecast runs")
+    else:
+        print(f"Run {stored.run_id}: forecast for {stored.as_of}, made {stored.created}, "
+              f"{stored.numsims} simulations, fingerprint {stored.fingerprint[:12]}")
+        print(stored.seat_summary)
+        print(f"{len(list_runs(conn))} runs stored")
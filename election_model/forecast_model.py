@@ -0,0 +1,270 @@
+"""
+forecast_model.py - Importable forecast API for the election model.
+
+    model = ForecastModel.load('weighted')
+    result = model.run(n_sims=10000, seed=1, as_of_date=date(2026, 8, 20))
+    export_csv(result, PROJECT_ROOT / 'model_results')
+
+load() builds the riding baseline with a baseline strategy (see baselines.py)
+and reads the national polls from election_database.db once. run() only
+weights the polls for the requested date (see polls.py) and simulates,
+returning the results in memory, so many forecasts can be made against one
+loaded dataset. Nothing touches the database or the filesystem at import
+time, and CSV export is a separate step.
+"""
+
+import os
+import sqlite3
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from analytic import analytic_forecast
+from instrumentation import stage
+from baseline_cache import load_or_build
+from baselines import get_baseline
+from error_models import get_error_model
+from forecast_engine import (PARTIES, BATCH_SIZE, chunk_size_for_budget, run_adaptive, run_simulations,
+                             simulate_batch, seat_stats, riding_probabilities, riding_probability_se,
+                             riding_vote_percents)
+from polls import load_polls, load_regional_polls, poll_averages
+from regions import RegionalPolls
+from run_manifest import derive_seed, inputs_fingerprint
+
+PROJECT_ROOT = Path(__file__).parent.parent
+DB_PATH = PROJECT_ROOT / 'election_database' / 'election_database.db'
+
+
+@dataclass
+class ForecastResult:
+    """In-memory result of ForecastModel.run().
+
+    seats       (n, P) uint16 seat counts of every simulation
+    aggregates  RunningAggregates with riding win counts and vote-share statistics
+    seed        SeedSequence entropy that reproduces the run
+    winners     (n, R) uint8 riding winner codes, kept only with run(keep_samples=True)
+    error_model polling error sampler the run used (see error_models.py)
+    regions     regions whose own polls set their swing (run(regional=True))
+    """
+    baseline: object
+    aggregates: object
+    seats: np.ndarray
+    seed: int
+    as_of_date: date
+    poll_averages: np.ndarray
+    margin_of_error: float
+    winners: np.ndarray = None
+    error_model: object = None
+    regions: list = None
+
+    @property
+    def numsims(self):
+        return self.aggregates.numsims
+
+    def seat_counts(self):
+        """Seat counts per simulation (seatcounts.csv layout)."""
+        return pd.DataFrame(self.seats, columns=PARTIES)
+
+    def seat_stats(self, with_se=False):
+        return seat_stats(self.aggregates, with_se)
+
+    def riding_probabilities(self):
+        return riding_probabilities(self.baseline, self.aggregates.win_counts, self.numsims)
+
+    def riding_probability_se(self):
+        return riding_probability_se(self.baseline, self.aggregates)
+
+    def riding_vote_percents(self):
+        mean, std = self.aggregates.share_stats()
+        return riding_vote_percents(self.baseline, mean, std)
+
+
+class ForecastModel:
+    """A loaded forecast dataset (riding baseline + polls) that can be run many times."""
+
+    def __init__(self, baseline, polls, strategy=None, baseline_key=None, regional_polls=None):
+        self.baseline = baseline
+        self.polls = polls
+        self.strategy = strategy
+        self.baseline_key = baseline_key
+        self.regional_polls = regional_polls
+
+    @classmethod
+    def load(cls, strategy='current', db_path=DB_PATH, use_cache=True):
+        """Build (or load the cached) baseline and read the polls, once.
+
+        `strategy` is a BaselineStrategy, a registered strategy name
+        ('current', 'weighted', ...) or a plain `loader(conn) -> Baseline`.
+        With `use_cache` the compiled baseline comes from baseline_cache.py.
+        """
+        strategy = get_baseline(strategy)
+        with stage('db load') as timer:
+            conn = sqlite3.connect(db_path)
+            try:
+                if use_cache:
+                    baseline, baseline_key = load_or_build(conn, strategy)
+                else:
+                    baseline, baseline_key = strategy.build(conn), None
+                polls = load_polls(conn)
+                regional_polls = RegionalPolls(load_regional_polls(conn), baseline.provinces)
+            finally:
+                conn.close()
+            timer.items = len(polls)
+        return cls(baseline, polls, strategy, baseline_key, regional_polls)
+
+    def poll_inputs(self, as_of_date=None):
+        """(poll averages (P,), margin of error) for `as_of_date` (default: today)."""
+        return poll_averages(self.polls, as_of_date or date.today())
+
+    def swing_inputs(self, averages, as_of_date, regional=False):
+        """(baseline, poll averages, regions) the engine simulates from.
+
+        With `regional`, ridings in regions with enough recent regional polls
+        swing with their region's polls instead of the national `averages`
+        (see regions.py); the poll averages are then (R, P).
+        """
+        if not regional:
+            return self.baseline, averages, None
+        if self.regional_polls is None:
+            raise ValueError("Model was loaded without regional polls")
+        baseline, riding_polls, used = self.regional_polls.swing_inputs(self.baseline, averages, as_of_date)
+        return baseline, riding_polls, [name for name, u in zip(self.regional_polls.regions, used) if u]
+
+    def fingerprint(self, n_sims, seed=None, as_of_date=None, regional=False, **config):
+        """(fingerprint, seed) of a run with these settings (see run_manifest.py).
+
+        `config` holds the other settings that change the output (error model,
+        chunk size, ...). Without a `seed` one is derived from the inputs, so
+        the same inputs always give the same run.
+        """
+        as_of_date = as_of_date or date.today()
+        averages, margin_of_error = self.poll_inputs(as_of_date)
+        baseline, riding_polls, _ = self.swing_inputs(averages, as_of_date, regional)
+        config = dict(config, regional=regional)
+        if seed is None:
+            seed = derive_seed(inputs_fingerprint(baseline, riding_polls, margin_of_error, config, n_sims))
+        return inputs_fingerprint(baseline, riding_polls, margin_of_error, config, n_sims, seed), seed
+
+    def run(self, n_sims=10000, seed=None, as_of_date=None, chunk_size=BATCH_SIZE, memory_budget_mb=None,
+            workers=1, adaptive=False, tolerance=0.5, seat_tolerance=0.25, min_sims=2000, keep_samples=False,
+            error_model=None, regional=False):
+        """Simulate the election as of `as_of_date` and return a ForecastResult.
+
+        With `adaptive`, n_sims is only a cap: simulation stops once every riding
+        win probability and mean seat count has a Monte Carlo standard error
+        within tolerance (see forecast_engine.run_adaptive). With `keep_samples`
+        the riding winners of every simulation are kept as well, for
+        sample_store.save_samples() and SampleStore.from_result().
+        `error_model` is an error_models.py sampler or name ('independent',
+        'correlated'); the default draws independent errors per riding.
+        `regional` swings ridings with their region's polls (see swing_inputs()).
+        The chunk size is rounded to suit the error model's sampler (a power of
+        2 for Sobol points, see ErrorModel.chunk_size()).
+        """
+        as_of_date = as_of_date or date.today()
+        error_model = get_error_model(error_model)
+        with stage('poll weighting'):
+            averages, margin_of_error = self.poll_inputs(as_of_date)
+            baseline, riding_polls, regions = self.swing_inputs(averages, as_of_date, regional)
+        if memory_budget_mb is not None:
+            chunk_size = chunk_size_for_budget(self.baseline, memory_budget_mb)
+        chunk_size = error_model.chunk_size(chunk_size, at_most=memory_budget_mb is not None)
+
+        seat_chunks = []
+        winner_chunks = []
+
+        def keep_seats(seats, winners):
+            seat_chunks.append(seats.astype(np.uint16))
+            if keep_samples:
+                winner_chunks.append(winners)
+
+        if adaptive:
+            aggregates, seed_seq = run_adaptive(baseline, riding_polls, margin_of_error, tolerance, seat_tolerance,
+                                                min_sims, n_sims, chunk_size, seed, workers, on_chunk=keep_seats,
+                                                error_model=error_model)
+        else:
+            aggregates, seed_seq = run_simulations(baseline, riding_polls, margin_of_error, n_sims, chunk_size,
+                                                   seed, workers, on_chunk=keep_seats, error_model=error_model)
+        seats = np.concatenate(seat_chunks) if seat_chunks else np.zeros((0, len(PARTIES)), dtype=np.uint16)
+        winners = None
+        if keep_samples:
+            winners = (np.concatenate(winner_chunks) if winner_chunks
+                       else np.zeros((0, self.baseline.num_ridings), dtype=np.uint8))
+        return ForecastResult(self.baseline, aggregates, seats, seed_seq.entropy, as_of_date,
+                              averages, margin_of_error, winners, error_model, regions)
+
+    def run_analytic(self, as_of_date=None, regional=False):
+        """Closed-form AnalyticForecast as of `as_of_date`, in milliseconds (see analytic.py).
+
+        Assumes independent polling errors, like run() with the default error model.
+        """
+        as_of_date = as_of_date or date.today()
+        with stage('poll weighting'):
+            averages, margin_of_error = self.poll_inputs(as_of_date)
+            baseline, riding_polls, _ = self.swing_inputs(averages, as_of_date, regional)
+        with stage('analytic', items=baseline.num_ridings):
+            forecast = analytic_forecast(baseline, riding_polls, margin_of_error, as_of_date)
+        forecast.poll_averages = averages
+        return forecast
+
+    def simulate_election(self, as_of_date=None, rng=None, error_model=None, regional=False):
+        """Simulate a single election.
+
+        Returns ({party: seats}, DataFrame of districtid / party / votepercent).
+        """
+        as_of_date = as_of_date or date.today()
+        averages, margin_of_error = self.poll_inputs(as_of_date)
+        baseline, riding_polls, _ = self.swing_inputs(averages, as_of_date, regional)
+        seats, winners, shares = simulate_batch(baseline, riding_polls, margin_of_error, 1, rng,
+                                                error_model=get_error_model(error_model))
+        contesting = np.isfinite(shares[0])
+        rows, cols = np.nonzero(contesting)
+        dfridingresults = pd.DataFrame({
+            'districtid': self.baseline.riding_ids[rows],
+            'party': np.array(PARTIES)[cols],
+            'votepercent': shares[0][contesting],
+        })
+        return dict(zip(PARTIES, seats[0].tolist())), dfridingresults
+
+
+def export_analytic_csv(forecast, path):
+    """Write ridingprobabilities and seatdistribution CSVs of an AnalyticForecast to `path`.
+
+    Returns the names of the files written.
+    """
+    path = Path(path)
+    path.mkdir(exist_ok=True)
+    with stage('export', items=2):
+        forecast.riding_probabilities().to_csv(os.path.join(path, 'ridingprobabilities.csv'), index=True)
+        forecast.seat_distribution().round(3).to_csv(os.path.join(path, 'seatdistribution.csv'), index=True)
+    return ['ridingprobabilities.csv', 'seatdistribution.csv']
+
+
+def csv_outputs(with_se=False):
+    """Names of the files export_csv() writes."""
+    outputs = ['seatcounts.csv', 'seatstats.csv', 'ridingprobabilities.csv', 'ridingvotepercents.csv']
+    if with_se:
+        outputs.append('ridingprobabilities_se.csv')
+    return outputs
+
+
+def export_csv(result, path, with_se=False):
+    """Write seatcounts, seatstats, ridingprobabilities and ridingvotepercents CSVs to `path`.
+
+    `with_se` also writes the Monte Carlo standard errors (mean_se column in
+    seatstats.csv and ridingprobabilities_se.csv), as adaptive runs do.
+    Returns the names of the files written (csv_outputs(with_se)).
+    """
+    path = Path(path)
+    path.mkdir(exist_ok=True)
+    with stage('export', items=len(csv_outputs(with_se))):
+        result.seat_counts().to_csv(os.path.join(path, 'seatcounts.csv'), index=False)
+        result.seat_stats(with_se).to_csv(os.path.join(path, 'seatstats.csv'), index=False)
+        result.riding_probabilities().to_csv(os.path.join(path, 'ridingprobabilities.csv'), index=True)
+        result.riding_vote_percents().to_csv(os.path.join(path, 'ridingvotepercents.csv'), index=True)
+        if with_se:
+            result.riding_probability_se().to_csv(os.path.join(path, 'ridingprobabilities_se.csv'), index=True)
+    return csv_outputs(with_se)
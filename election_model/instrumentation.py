@@ -0,0 +1,331 @@
+"""
+instrumentation.py - Stage timings, memory and progress for the pipeline scripts.
+
+    report = RunReport('election_model', show_progress=True)
+    with report:
+        with stage('db load'):
+            model = ForecastModel.load()
+        with stage('export') as s:
+            s.items = len(export_csv(result, path))
+    report.write(REPORTS_DIR / 'election_model.json')
+
+While a RunReport is active, stage() records the wall time, CPU time, peak
+RSS and item count of each named stage, and library code can add time
+measured elsewhere (e.g. per simulation chunk, in worker processes) with
+record(). progress() gives a rate-limited progress line with the rate and
+time left. With no active report all three are no-ops costing one global
+lookup, so the hooks stay in the code permanently.
+
+Peak RSS is the process high-water mark. On Linux it is reset at the start
+of every stage (/proc/self/clear_refs), so each stage reports its own peak;
+elsewhere a stage reports the peak of the run so far. On Windows the peak
+comes from psutil if it is installed and is otherwise not recorded (None).
+Stages recorded from worker processes carry time and items but no memory.
+"""
+
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+PROJECT_ROOT = Path(__file__).parent.parent
+REPORTS_DIR = PROJECT_ROOT / 'run_reports'
+
+# Seconds between progress lines in logs, and between redraws on a terminal
+PROGRESS_INTERVAL = 5.0
+TERMINAL_PROGRESS_INTERVAL = 0.2
+
+# The RunReport stage() and record() report to, if any
+_active = None
+
+
+def _read_status_kb(field):
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def max_rss_mb():
+    """Peak resident set size of the process over its whole life, in MB, or None where unknown."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+    if psutil is not None:
+        # peak_wset is the peak working set on Windows
+        peak = getattr(psutil.Process().memory_info(), 'peak_wset', None)
+        return None if peak is None else peak / 1024 ** 2
+    return None
+
+
+def _max_mb(*values):
+    """Largest of the peaks that are known, or None."""
+    known = [v for v in values if v is not None]
+    return max(known) if known else None
+
+
+def peak_rss_mb():
+    """Peak resident set size in MB (since the last reset_peak_rss(), where supported), or None where unknown."""
+    peak_kb = _read_status_kb('VmHWM')
+    return max_rss_mb() if peak_kb is None else peak_kb / 1024
+
+
+def reset_peak_rss():
+    """Reset the peak RSS to the current RSS; returns False where that is not supported."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+class Stage:
+    """Totals of one named stage: calls, wall and CPU seconds, peak RSS and items."""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.peak_rss_mb = None
+        self.items = None
+
+    def add(self, wall_s, cpu_s, items=None, peak_rss_mb=None):
+        self.calls += 1
+        self.wall_s += wall_s
+        self.cpu_s += cpu_s
+        if items is not None:
+            self.items = (self.items or 0) + items
+        if peak_rss_mb is not None:
+            self.peak_rss_mb = _max_mb(self.peak_rss_mb, peak_rss_mb)
+
+    def to_dict(self):
+        stage = {
+            'name': self.name,
+            'calls': self.calls,
+            'wall_s': round(self.wall_s, 4),
+            'cpu_s': round(self.cpu_s, 4),
+            'peak_rss_mb': None if self.peak_rss_mb is None else round(self.peak_rss_mb, 1),
+            'items': self.items,
+        }
+        if self.items and self.wall_s > 0:
+            stage['items_per_s'] = round(self.items / self.wall_s, 1)
+        return stage
+
+
+class _StageTimer:
+    """An open stage() block; set `items` inside the block to record a count."""
+
+    def __init__(self, name, items):
+        self.name = name
+        self.items = items
+        self.child_peak = None
+
+
+class RunReport:
+    """Stages and details of one run of a pipeline script, written as JSON."""
+
+    def __init__(self, name, show_progress=False):
+        self.name = name
+        self.show_progress = show_progress
+        self.stages = {}
+        self.details = {}
+        self.status = None
+        self._open = []
+        self._started = None
+        self._start_wall = None
+        self._start_cpu = None
+        self._finished = None
+        self._wall_s = None
+        self._cpu_s = None
+        self._previous = None
+
+    def __enter__(self):
+        global _active
+        self._previous, _active = _active, self
+        self._started = datetime.now(timezone.utc)
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        global _active
+        _active = self._previous
+        self._finished = datetime.now(timezone.utc)
+        self._wall_s = time.perf_counter() - self._start_wall
+        self._cpu_s = time.process_time() - self._start_cpu
+        if self.status is None:
+            self.status = 'ok' if exc_type is None else 'error'
+        if exc_type is not None and exc_type not in (SystemExit, KeyboardInterrupt):
+            self.details.setdefault('error', f'{exc_type.__name__}: {exc}')
+        return False
+
+    def _stage(self, name):
+        if name not in self.stages:
+            self.stages[name] = Stage(name)
+        return self.stages[name]
+
+    @contextmanager
+    def stage(self, name, items=None):
+        timer = _StageTimer(name, items)
+        if self._open:
+            # Keep the enclosing stage's peak so far before resetting it for this one
+            self._open[-1].child_peak = _max_mb(self._open[-1].child_peak, peak_rss_mb())
+        reset_peak_rss()
+        self._open.append(timer)
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        try:
+            yield timer
+        finally:
+            wall_s = time.perf_counter() - start_wall
+            cpu_s = time.process_time() - start_cpu
+            self._open.pop()
+            peak = _max_mb(peak_rss_mb(), timer.child_peak)
+            if self._open:
+                self._open[-1].child_peak = _max_mb(self._open[-1].child_peak, peak)
+            self._stage(name).add(wall_s, cpu_s, timer.items, peak)
+
+    def record(self, name, wall_s, cpu_s=0.0, items=None, memory=False):
+        """Add time measured elsewhere (e.g. in a worker process) to stage `name`.
+
+        With `memory` the peak RSS since the last stage started is recorded too.
+        """
+        self._stage(name).add(wall_s, cpu_s, items, peak_rss_mb() if memory else None)
+
+    def peak_rss_mb(self):
+        """Peak RSS of the whole run, or None where unknown.
+
+        The per-stage resets also reset the process high-water mark, so this is
+        the largest of the stage peaks and the current one.
+        """
+        return _max_mb(*(stage.peak_rss_mb for stage in self.stages.values()), peak_rss_mb())
+
+    def to_dict(self):
+        peak = self.peak_rss_mb()
+        return {
+            'name': self.name,
+            'status': self.status,
+            'started': self._started and self._started.isoformat(timespec='seconds'),
+            'finished': self._finished and self._finished.isoformat(timespec='seconds'),
+            'wall_s': None if self._wall_s is None else round(self._wall_s, 4),
+            'cpu_s': None if self._cpu_s is None else round(self._cpu_s, 4),
+            'peak_rss_mb': None if peak is None else round(peak, 1),
+            'pid': os.getpid(),
+            'stages': [stage.to_dict() for stage in self.stages.values()],
+            'details': self.details,
+        }
+
+    def write(self, path=None):
+        """Write the report as JSON (default run_reports/<name>.json); returns the path."""
+        path = Path(path) if path is not None else REPORTS_DIR / f'{self.name}.json'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_dict(), indent=1, default=str))
+        return path
+
+    def summary(self):
+        """One line of stage wall times, e.g. "db load 0.05 s, simulate 2.10 s"."""
+        return ', '.join(f'{stage.name} {stage.wall_s:.2f} s' for stage in self.stages.values()) or 'none'
+
+
+class Progress:
+    """Rate-limited progress: a redrawn line on a terminal, a log line every few seconds otherwise."""
+
+    def __init__(self, total, label, stream=None, interval=None):
+        self.total = total
+        self.label = label
+        self.stream = stream or sys.stderr
+        self.terminal = self.stream.isatty()
+        if interval is None:
+            interval = TERMINAL_PROGRESS_INTERVAL if self.terminal else PROGRESS_INTERVAL
+        self.interval = interval
+        self.done = 0
+        self._start = time.perf_counter()
+        self._last = self._start
+
+    def update(self, n):
+        self.done += n
+        now = time.perf_counter()
+        if now - self._last >= self.interval:
+            self._last = now
+            self._write(now)
+
+    def _write(self, now, final=False):
+        elapsed = now - self._start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        line = f'{self.label}: {self.done:,}'
+        if self.total:
+            line += f'/{self.total:,} ({100 * self.done / self.total:.0f}%)'
+        line += f', {rate:,.0f}/s'
+        if final:
+            line += f', {elapsed:.1f} s'
+        elif self.total and rate > 0:
+            line += f', {max(self.total - self.done, 0) / rate:.1f} s left'
+        if self.terminal:
+            self.stream.write('\r' + line.ljust(72) + ('\n' if final else ''))
+        else:
+            self.stream.write(line + '\n')
+        self.stream.flush()
+
+    def close(self):
+        # Logs only get a final line if progress was shown at all
+        if self.terminal or self._last > self._start:
+            self._write(time.perf_counter(), final=True)
+
+
+class _NullProgress:
+    def update(self, n):
+        pass
+
+    def close(self):
+        pass
+
+
+@contextmanager
+def _null_stage(name, items=None):
+    yield _StageTimer(name, items)
+
+
+def stage(name, items=None):
+    """Context manager timing stage `name` in the active report (a no-op without one)."""
+    if _active is None:
+        return _null_stage(name, items)
+    return _active.stage(name, items)
+
+
+def record(name, wall_s, cpu_s=0.0, items=None, memory=False):
+    """Add externally measured time to stage `name` of the active report, if any."""
+    if _active is not None:
+        _active.record(name, wall_s, cpu_s, items, memory)
+
+
+def detail(key, value):
+    """Set a free-form detail (counts, settings) on the active report, if any."""
+    if _active is not None:
+        _active.details[key] = value
+
+
+def progress(total, label):
+    """A Progress for `total` items if the active report shows progress, else a no-op."""
+    if _active is None or not _active.show_progress:
+        return _NullProgress()
+    return Progress(total, label)
@@ -0,0 +1,145 @@
+"""
+polls.py - National polling averages, for one forecast date or many at once.
+
+Poll dates, sample sizes and party numbers are read into arrays once (a
+PollTable, with a mask of which values each poll reported), and the weights
+for D forecast dates are built as a (D, polls) matrix, so the averages for
+every date come out of one matrix product:
+
+    averages, margin_of_error = poll_averages(polls, date(2026, 8, 20))
+    averages, margin_of_error = poll_averages(polls, np.arange('2026-06-01', '2026-09-01', dtype='datetime64[D]'))
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from forecast_engine import PARTIES
+
+# Columns load_polls() reads: one value column per party, then the margin of error
+VALUE_COLUMNS = PARTIES + ['error']
+
+# Polls up to FULL_WEIGHT_DAYS old count fully, then lose DECAY_PER_DAY of their
+# weight a day until they drop out after MAX_AGE_DAYS
+FULL_WEIGHT_DAYS = 7
+MAX_AGE_DAYS = 28
+DECAY_PER_DAY = 0.047
+REFERENCE_SAMPLE = 600
+
+
+@dataclass
+class PollTable:
+    """Polls as arrays, in table order.
+
+    region    (N,)        polls.region
+    lastdate  (N,)        last fieldwork date, datetime64[D]
+    sample    (N,)        sample size, 0 if not reported (the poll gets no weight)
+    values    (N, P + 1)  party shares then margin of error, 0 where not reported
+    present   (N, P + 1)  True where the value was reported
+    """
+    region: np.ndarray
+    lastdate: np.ndarray
+    sample: np.ndarray
+    values: np.ndarray
+    present: np.ndarray
+
+    def __len__(self):
+        return len(self.lastdate)
+
+    def select(self, mask):
+        """The polls where `mask` is True."""
+        return PollTable(self.region[mask], self.lastdate[mask], self.sample[mask],
+                         self.values[mask], self.present[mask])
+
+    @classmethod
+    def from_rows(cls, rows):
+        """From (region, lastdate, sample, *VALUE_COLUMNS) rows, with None for anything not reported."""
+        rows = list(rows)
+        if not rows:
+            return cls(np.array([], dtype=object), np.array([], dtype='datetime64[D]'), np.zeros(0),
+                       np.zeros((0, len(VALUE_COLUMNS))), np.zeros((0, len(VALUE_COLUMNS)), dtype=bool))
+        region, lastdate, sample, *values = zip(*rows)
+        values = np.array(values, dtype=float).T
+        present = ~np.isnan(values)
+        return cls(np.array(region, dtype=object), as_dates(lastdate),
+                   np.nan_to_num(np.array(sample, dtype=float)),
+                   np.where(present, values, 0.0), present)
+
+    @classmethod
+    def from_frame(cls, frame):
+        """From a DataFrame with region, lastdate, sample and VALUE_COLUMNS columns (NaN for not reported)."""
+        return cls.from_rows(frame[['region', 'lastdate', 'sample'] + VALUE_COLUMNS].itertuples(index=False))
+
+
+def _select_polls(conn, where):
+    rows = conn.execute(f"SELECT region, lastdate, sample, {', '.join(VALUE_COLUMNS)} "
+                        f"FROM polls WHERE {where} ORDER BY rowid")
+    return PollTable.from_rows(rows)
+
+
+def load_polls(conn):
+    """National polls as a PollTable.
+
+    Relies on the typed polls table (see election_database/normalize_polls.py):
+    numbers are stored as numbers and anything not reported as NULL.
+    """
+    return _select_polls(conn, "region = 'National'")
+
+
+def load_regional_polls(conn):
+    """Regional polls (every region but 'National' and the 'Election' results rows) as a PollTable."""
+    return _select_polls(conn, "region NOT IN ('National', 'Election')")
+
+
+def weighted_averages(weights, polls):
+    """Weighted average of each of the polls' value columns, over the polls that reported it.
+
+    `weights` is (N,) or (D, N); returns (P + 1,) or (D, P + 1), NaN where no
+    weighted poll reported the value.
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (weights @ polls.values) / (weights @ polls.present)
+
+
+def as_dates(as_of):
+    """A date, ISO string or datetime64 (or an array of them) as datetime64[D]."""
+    return np.asarray(as_of, dtype='datetime64[D]')
+
+
+def poll_weights(polls, as_of):
+    """Weight of each poll from its sample size and age on `as_of`.
+
+    Polls up to 7 days old get full weight, decaying by 4.7% a day until they
+    drop out after 28 days; the sample size weight is sqrt(sample / 600).
+    Weights are rounded to 2 decimals, as the original loop did. Polls
+    published after `as_of` get no weight, so reruns for past dates only see
+    the polls that were out at the time.
+
+    Returns (N,) weights for a single date, or (D, N) for an array of D dates.
+    """
+    sizeweight = np.sqrt(polls.sample / REFERENCE_SAMPLE)
+
+    age = (as_dates(as_of)[..., None] - polls.lastdate).astype(np.int64)
+    decay = np.where(age <= FULL_WEIGHT_DAYS, 1.0, 1 - DECAY_PER_DAY * (age - FULL_WEIGHT_DAYS))
+    decay[(age < 0) | (age > MAX_AGE_DAYS)] = 0
+    return np.round(sizeweight * decay, 2)
+
+
+def poll_averages(polls, as_of):
+    """Weighted polling average per party and weighted margin of error on `as_of`.
+
+    For a single date returns (averages (P,), margin_of_error) and raises
+    ValueError if no poll is recent enough. For an array of D dates returns
+    ((D, P) averages, (D,) margins of error), NaN on dates without polls.
+    Each party is averaged over the polls that reported it, so a party no
+    recent poll reports is NaN (and left out of the simulation) rather than
+    averaged in as 0. Everything is rounded to 1 decimal.
+    """
+    weights = poll_weights(polls, as_of)
+    if weights.ndim == 1 and weights.sum() == 0:
+        raise ValueError(f"No national polls within {MAX_AGE_DAYS} days of {as_of}")
+
+    averages = np.round(weighted_averages(weights, polls), 1)
+    if weights.ndim == 1:
+        return averages[:-1], float(averages[-1])
+    return averages[:, :-1], averages[:, -1]
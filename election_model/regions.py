@@ -0,0 +1,125 @@
+"""
+regions.py - Provinces, polling regions and the regional swing model.
+
+Every riding is mapped once, from ridings.province, to an integer region
+index. Per-region arrays are then spread to ridings with a single gather
+(table[index]), so using regions costs no per-riding string matching.
+
+RegionalPolls averages the regional polls with the national weighting rules
+(see polls.py) and swings each riding by its own region's polls:
+
+    newvote = vote + ((regionpoll + err - regionvote) / regionvote) * vote
+
+where regionvote is the region's baseline share: its ridings' shares
+weighted by the votes cast in each, i.e. the party's share of the region's
+vote, which is what a regional poll measures. Regions whose polls carry too little weight on the forecast date,
+and parties a region's polls do not cover, fall back to the national swing.
+"""
+
+from dataclasses import replace
+
+import numpy as np
+
+from forecast_engine import PARTIES
+from polls import poll_weights, weighted_averages
+
+# Province code -> region; ridings in the same region share a regional polling miss
+PROVINCE_REGIONS = {
+    'NL': 'Atlantic', 'PEI': 'Atlantic', 'NS': 'Atlantic', 'NB': 'Atlantic',
+    'QC': 'Quebec',
+    'ON': 'Ontario',
+    'MB': 'Prairies', 'SK': 'Prairies',
+    'AB': 'Alberta',
+    'BC': 'BC',
+    'YT': 'North', 'NW': 'North', 'NU': 'North',
+}
+
+# polls.region -> region. Single-province polls (e.g. 'Manitoba') are not
+# representative of their region and are left out.
+POLL_REGIONS = {
+    'Atlantic Canada': 'Atlantic',
+    'Québec': 'Quebec',
+    'Ontario': 'Ontario',
+    'MB/SK': 'Prairies',
+    'Alberta': 'Alberta',
+    'BC/CB': 'BC',
+}
+
+# Total poll weight a region needs on the forecast date to use its own swing;
+# 1.0 is one full-weight poll of 600 respondents
+MIN_REGIONAL_WEIGHT = 1.0
+
+
+def region_index(provinces):
+    """(R,) region number of each riding, and the region names it indexes into.
+
+    Ridings whose province has no region (e.g. unknown '') form their own region.
+    """
+    regions = [PROVINCE_REGIONS.get(p, p) for p in np.asarray(provinces).tolist()]
+    names, index = np.unique(regions, return_inverse=True)
+    return index, names
+
+
+class RegionalPolls:
+    """Regional polls and the riding -> polled region index for one set of ridings.
+
+    `polls` is a PollTable of regional polls (polls.load_regional_polls()),
+    `provinces` the (R,) province code of each riding.
+    """
+
+    def __init__(self, polls, provinces, min_weight=MIN_REGIONAL_WEIGHT):
+        self.polls = polls.select(np.array([r in POLL_REGIONS for r in polls.region], dtype=bool))
+        self.regions = sorted(set(POLL_REGIONS.values()))
+        self.min_weight = min_weight
+
+        # (G, N) poll membership, built once
+        poll_region = np.searchsorted(self.regions, [POLL_REGIONS[r] for r in self.polls.region])
+        self.membership = (poll_region == np.arange(len(self.regions))[:, None]).astype(float)
+
+        # (R,) index into self.regions, len(self.regions) for ridings without a polled region
+        riding_regions = np.array([PROVINCE_REGIONS.get(p, '') for p in np.asarray(provinces).tolist()])
+        index = np.searchsorted(self.regions, riding_regions)
+        polled = np.isin(riding_regions, self.regions)
+        self.riding_region = np.where(polled, index, len(self.regions))
+
+    def averages(self, as_of):
+        """((G, P) weighted polling averages, (G,) total poll weight) per region on `as_of`.
+
+        Parties are averaged over the region's polls that reported them (NaN if none did).
+        """
+        weights = self.membership * poll_weights(self.polls, as_of)
+        totals = weights.sum(axis=1)
+        averages = np.round(weighted_averages(weights, self.polls)[:, :-1], 1)
+        return averages, totals
+
+    def reference_shares(self, baseline):
+        """(G, P) baseline share of each region: its ridings' shares weighted by their votes."""
+        weights = (self.riding_region == np.arange(len(self.regions))[:, None]) * baseline.votes
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return (weights @ baseline.shares) / weights.sum(axis=1)[:, None]
+
+    def swing_inputs(self, baseline, poll_averages, as_of):
+        """Baseline and (R, P) polling averages that apply the regional swing.
+
+        The engine computes vote * (poll + err) / national, so each riding is
+        given its region's polling average and its baseline shares are
+        rescaled by national / regionvote; this is the regional swing formula
+        above. Cells without a usable regional number keep the national poll
+        and the unscaled share.
+
+        Returns (baseline, poll averages (R, P), (G,) mask of regions using their own polls).
+        """
+        averages, totals = self.averages(as_of)
+        reference = self.reference_shares(baseline)
+        used = totals >= self.min_weight
+        usable = used[:, None] & np.isfinite(averages) & np.isfinite(reference) & (reference > 0)
+
+        # Row G is the national fallback for ridings outside the polled regions
+        polls_table = np.vstack([np.where(usable, averages, poll_averages), poll_averages])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            scale = np.where(usable, baseline.national / reference, 1.0)
+        scale_table = np.vstack([np.where(np.isfinite(scale), scale, 1.0), np.ones(len(PARTIES))])
+
+        riding_polls = polls_table[self.riding_region]
+        swung = replace(baseline, shares=baseline.shares * scale_table[self.riding_region])
+        return swung, riding_polls, used
@@ -0,0 +1,130 @@
+"""
+run_manifest.py - Run fingerprints and the model_results/run.json manifest.
+
+A run's fingerprint is a sha256 of everything that determines its output:
+the compiled baseline, the poll averages and margin of error the engine sees
+(per riding with the regional swing), the model configuration, the seed and
+the number of simulations. Poll weights only reach the engine through the
+averages (rounded to 0.1), so a day on which no poll arrived and the
+averages did not move keeps the same fingerprint.
+
+Without an explicit seed the seed is derived from the same inputs, so an
+unchanged day reproduces the previous day's output exactly and can be
+skipped; run.json records the fingerprint and a hash of every output file
+for downstream stages (create_geojson.py) to compare against. Writing a
+manifest deletes the outputs of the previous run that the new run did not
+write (say seatcounts.csv after an --analytic run), so the directory only
+ever holds one run's files.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+# Bump when the engine maths changes, so old results stop matching
+FINGERPRINT_VERSION = 1
+
+MANIFEST_FILE = 'run.json'
+
+
+def _canonical(values):
+    """JSON-ready nested lists with NaN as None, rounded to hide float noise."""
+    values = np.round(np.asarray(values, dtype=float), 9)
+    return np.where(np.isfinite(values), values, None).tolist()
+
+
+def baseline_digest(baseline):
+    """sha256 of a compiled Baseline's arrays."""
+    h = hashlib.sha256()
+    for values in (baseline.riding_ids, baseline.provinces, baseline.present):
+        h.update(np.ascontiguousarray(values).tobytes())
+    h.update(json.dumps([_canonical(baseline.shares), _canonical(baseline.national)]).encode())
+    return h.hexdigest()
+
+
+def inputs_fingerprint(baseline, poll_averages, margin_of_error, config, numsims, seed=None):
+    """sha256 of the run inputs; with seed=None, of everything but the seed."""
+    payload = {
+        'version': FINGERPRINT_VERSION,
+        'baseline': baseline_digest(baseline),
+        'poll_averages': _canonical(poll_averages),
+        'margin_of_error': _canonical(margin_of_error),
+        'config': config,
+        'numsims': int(numsims),
+        'seed': seed,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def derive_seed(fingerprint):
+    """A 64-bit seed taken from an inputs fingerprint."""
+    return int(fingerprint[:16], 16)
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def read_manifest(results_dir):
+    """The run.json of `results_dir`, or None."""
+    path = Path(results_dir) / MANIFEST_FILE
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def remove_stale_outputs(results_dir, outputs):
+    """Delete the outputs recorded in the current manifest that are not in `outputs`; returns their names."""
+    results_dir = Path(results_dir)
+    previous = read_manifest(results_dir) or {}
+    stale = sorted(set(previous.get('outputs', {})) - set(outputs))
+    for name in stale:
+        path = results_dir / name
+        path.unlink(missing_ok=True)
+        if path.parent != results_dir and path.parent.is_dir() and not any(path.parent.iterdir()):
+            path.parent.rmdir()  # e.g. samples/ once its files are gone
+    return stale
+
+
+def write_manifest(results_dir, fingerprint, outputs, **details):
+    """Record the fingerprint and the sha256 of each output (paths relative to `results_dir`).
+
+    Outputs of the previous run that are not among `outputs` are deleted.
+    """
+    results_dir = Path(results_dir)
+    remove_stale_outputs(results_dir, outputs)
+    manifest = {
+        'fingerprint': fingerprint,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        **details,
+        'outputs': {name: file_digest(results_dir / name) for name in outputs},
+    }
+    tmp = results_dir / (MANIFEST_FILE + '.tmp')
+    tmp.write_text(json.dumps(manifest, indent=1, default=str))
+    os.replace(tmp, results_dir / MANIFEST_FILE)
+    return manifest
+
+
+def is_current(results_dir, fingerprint, outputs):
+    """True if `results_dir` already holds these outputs, untouched, for this fingerprint."""
+    manifest = read_manifest(results_dir)
+    if manifest is None or manifest.get('fingerprint') != fingerprint:
+        return False
+    recorded = manifest.get('outputs', {})
+    results_dir = Path(results_dir)
+    for name in outputs:
+        path = results_dir / name
+        if name not in recorded or not path.exists() or file_digest(path) != recorded[name]:
+            return False
+    return True
@@ -0,0 +1,192 @@
+"""
+sample_store.py - Compact per-simulation results on disk, and fast queries over them.
+
+    save_samples(result, PROJECT_ROOT / 'model_results' / 'samples')
+    store = SampleStore.open(PROJECT_ROOT / 'model_results' / 'samples')
+
+    store.probability(store.majority('cpc'))
+    store.probability(store.wins(35001, 'cpc') & store.most_seats('lpc'))
+    store.probability(store.wins(35001, 'cpc'), given=store.most_seats('lpc'))
+    store.seat_distribution('lpc', given=store.sweeps('QC', 'bq'))
+
+A store directory holds
+    seats.npy    (n, P) uint16  seats won by each party in each simulation
+    winners.npy  (n, R) uint8   index into `parties` of each riding's winner
+    meta.json    parties, riding ids, province codes, seed, forecast date, poll inputs
+
+The arrays are memory-mapped on open. Events are (n,) boolean arrays over the
+simulations and combine with & | ~, so every query is a single vectorized pass.
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from forecast_engine import PARTIES
+
+SEATS_FILE = 'seats.npy'
+WINNERS_FILE = 'winners.npy'
+META_FILE = 'meta.json'
+
+# Files save_samples() writes
+SAMPLE_FILES = [SEATS_FILE, WINNERS_FILE, META_FILE]
+
+
+def save_samples(result, path):
+    """Write the seats and riding winners of a ForecastResult run with keep_samples=True.
+
+    Returns the names of the files written.
+    """
+    if result.winners is None:
+        raise ValueError("Result has no riding winners; run the model with keep_samples=True")
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    np.save(path / SEATS_FILE, np.ascontiguousarray(result.seats, dtype=np.uint16))
+    np.save(path / WINNERS_FILE, np.ascontiguousarray(result.winners, dtype=np.uint8))
+    meta = {
+        'parties': PARTIES,
+        'riding_ids': result.baseline.riding_ids.tolist(),
+        'provinces': result.baseline.provinces.tolist(),
+        'numsims': result.numsims,
+        'seed': result.seed,
+        'as_of_date': result.as_of_date.isoformat(),
+        'poll_averages': [None if np.isnan(v) else float(v) for v in result.poll_averages],
+        'margin_of_error': float(result.margin_of_error),
+    }
+    (path / META_FILE).write_text(json.dumps(meta, indent=1))
+    return list(SAMPLE_FILES)
+
+
+class SampleStore:
+    """Per-simulation seats and riding winners, with marginal / joint / conditional queries."""
+
+    def __init__(self, seats, winners, parties, riding_ids, provinces, meta=None):
+        self.seats = seats
+        self.winners = winners
+        self.parties = list(parties)
+        self.riding_ids = np.asarray(riding_ids)
+        self.provinces = np.asarray(provinces)
+        self.meta = meta or {}
+
+    @classmethod
+    def open(cls, path, mmap=True):
+        """Open a store written by save_samples(); the arrays are memory-mapped unless `mmap` is False."""
+        path = Path(path)
+        mode = 'r' if mmap else None
+        meta = json.loads((path / META_FILE).read_text())
+        return cls(np.load(path / SEATS_FILE, mmap_mode=mode), np.load(path / WINNERS_FILE, mmap_mode=mode),
+                   meta['parties'], meta['riding_ids'], meta['provinces'], meta)
+
+    @classmethod
+    def from_result(cls, result):
+        """Query a ForecastResult run with keep_samples=True without going through disk."""
+        if result.winners is None:
+            raise ValueError("Result has no riding winners; run the model with keep_samples=True")
+        return cls(result.seats, result.winners, PARTIES, result.baseline.riding_ids,
+                   result.baseline.provinces)
+
+    @property
+    def numsims(self):
+        return len(self.seats)
+
+    @property
+    def num_ridings(self):
+        return len(self.riding_ids)
+
+    @property
+    def majority_seats(self):
+        return self.num_ridings // 2 + 1
+
+    def _party(self, party):
+        try:
+            return self.parties.index(party.lower())
+        except ValueError:
+            raise KeyError(f"Unknown party {party!r}") from None
+
+    def _riding(self, riding_id):
+        r = int(np.searchsorted(self.riding_ids, riding_id))
+        if r == self.num_ridings or self.riding_ids[r] != riding_id:
+            raise KeyError(f"Unknown riding {riding_id!r}")
+        return r
+
+    def _province(self, province):
+        columns = np.flatnonzero(self.provinces == province)
+        if len(columns) == 0:
+            raise KeyError(f"No ridings in province {province!r}")
+        return columns
+
+    # ── Events: (n,) boolean arrays over the simulations ─────────────────────
+
+    def wins(self, riding_id, party):
+        """`party` wins riding `riding_id` (FED_NUM)."""
+        return self.winners[:, self._riding(riding_id)] == self._party(party)
+
+    def seats_at_least(self, party, seats):
+        return self.seats[:, self._party(party)] >= seats
+
+    def majority(self, party):
+        """`party` wins a majority of the ridings."""
+        return self.seats_at_least(party, self.majority_seats)
+
+    def most_seats(self, party):
+        """`party` wins strictly more seats than any other party (forms government)."""
+        j = self._party(party)
+        others = np.delete(np.asarray(self.seats), j, axis=1).max(axis=1)
+        return self.seats[:, j] > others
+
+    def province_seats(self, province, party):
+        """(n,) seats won by `party` in the ridings of `province` (e.g. 'QC')."""
+        return (self.winners[:, self._province(province)] == self._party(party)).sum(axis=1)
+
+    def sweeps(self, province, party):
+        """`party` wins every riding of `province`."""
+        return (self.winners[:, self._province(province)] == self._party(party)).all(axis=1)
+
+    # ── Probabilities ────────────────────────────────────────────────────────
+
+    def probability(self, event, given=None):
+        """P(event), or P(event | given); NaN if `given` never happens."""
+        event = np.asarray(event, dtype=bool)
+        if given is not None:
+            event = event[np.asarray(given, dtype=bool)]
+        return float(event.mean()) if len(event) else float('nan')
+
+    def joint(self, *events):
+        """P(all of `events`)."""
+        return self.probability(np.logical_and.reduce([np.asarray(e, dtype=bool) for e in events]))
+
+    def seat_distribution(self, party, given=None):
+        """P(party wins k seats) for k = 0..R, optionally conditional on `given`."""
+        seats = self.seats[:, self._party(party)]
+        if given is not None:
+            seats = seats[np.asarray(given, dtype=bool)]
+        counts = np.bincount(seats, minlength=self.num_ridings + 1)
+        with np.errstate(invalid='ignore'):
+            return pd.Series(counts / len(seats), index=pd.RangeIndex(len(counts), name='seats'), name=party)
+
+    def riding_probabilities(self, given=None):
+        """(R, P) riding win probabilities, optionally conditional on `given`."""
+        winners = self.winners if given is None else self.winners[np.asarray(given, dtype=bool)]
+        num_parties = len(self.parties)
+        codes = np.asarray(winners, dtype=np.intp) + np.arange(self.num_ridings) * num_parties
+        counts = np.bincount(codes.ravel(), minlength=self.num_ridings * num_parties)
+        with np.errstate(invalid='ignore'):
+            return pd.DataFrame(counts.reshape(self.num_ridings, num_parties) / len(winners),
+                                index=pd.Index(self.riding_ids, name='FED_NUM'), columns=self.parties)
+
+    def summary(self):
+        """P(majority) and P(most seats) per party."""
+        return pd.DataFrame({
+            'majority': [self.probability(self.majority(p)) for p in self.parties],
+            'most_seats': [self.probability(self.most_seats(p)) for p in self.parties],
+        }, index=self.parties)
+
+
+if __name__ == '__main__':
+    store_path = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(__file__).parent.parent / 'model_results' / 'samples'
+    store = SampleStore.open(store_path)
+    print(f"{store.numsims} simulations, {store.num_ridings} ridings, majority = {store.majority_seats} seats")
+    print((store.summary() * 100).round(1))
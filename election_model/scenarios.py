@@ -0,0 +1,197 @@
+"""
+scenarios.py - What-if poll scenarios evaluated on one cached set of error draws.
+
+    model = ForecastModel.load()
+    what_if = WhatIf.from_model(model, n_sims=10000, seed=1, as_of_date=date(2026, 8, 20))
+    stores = what_if.evaluate_many({'base': {}, 'lpc -3': {'lpc': -3}, 'lpc -3 cpc +3': {'lpc': -3, 'cpc': 3}})
+    print(scenario_summary(stores))
+    stores['lpc -3'].probability(stores['lpc -3'].majority('lpc'))
+
+The standardized (sims x ridings x parties) error draws are drawn once, in
+the same chunks and streams as ForecastModel.run(), and kept as float32 (in
+memory, or memory-mapped from a draws.npy saved with save()). A scenario
+shifts the polling averages and re-evaluates the cached draws with
+forecast_engine.simulate_winners(), which takes about 0.15 s for 10,000
+simulations. Every scenario sees the same draws, so differences between
+scenarios are free of Monte Carlo noise between runs.
+
+With the same seed the base scenario matches ForecastModel.run() up to the
+float32 rounding of the draws (about 1e-7 of a draw): a riding whose top two
+simulated shares are within about 1e-6 points of each other can go to the
+other party. That is rare (a handful of riding results in millions), so win
+probabilities agree to well within 0.1 points.
+
+Scenario results are sample_store.SampleStore objects, with its marginal,
+joint and conditional queries, seat distributions and riding probabilities.
+"""
+
+import argparse
+import json
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from error_models import ERROR_MODELS, get_error_model
+from forecast_engine import PARTIES, BATCH_SIZE, simulate_winners
+from forecast_model import ForecastModel
+from sample_store import SampleStore
+
+DRAWS_FILE = 'draws.npy'
+DRAWS_META_FILE = 'draws.json'
+
+
+def draw_errors(baseline, numsims, chunk_size=BATCH_SIZE, seed=None, error_model=None):
+    """(n, R, P) float32 standardized error draws, chunk by chunk as run_simulations() draws them.
+
+    Returns (draws, seed_sequence).
+    """
+    error_model = get_error_model(error_model)
+    chunk_size = error_model.chunk_size(chunk_size)
+    seed_seq = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    draws = np.empty((numsims, baseline.num_ridings, len(PARTIES)), dtype=np.float32)
+    starts = range(0, numsims, chunk_size)
+    for start, child in zip(starts, seed_seq.spawn(len(starts))):
+        size = min(chunk_size, numsims - start)
+        draws[start:start + size] = error_model.sample(np.random.default_rng(child), size, baseline)
+    return draws, seed_seq
+
+
+def scenario_shift(scenario):
+    """(P,) poll shift in points from a {party: points} dict (missing parties: 0)."""
+    scenario = {party.lower(): points for party, points in scenario.items()}
+    unknown = set(scenario) - set(PARTIES)
+    if unknown:
+        raise KeyError(f"Unknown parties in scenario: {sorted(unknown)}")
+    return np.array([float(scenario.get(party, 0)) for party in PARTIES])
+
+
+class WhatIf:
+    """Cached error draws for one model, forecast date and swing, re-evaluated per scenario."""
+
+    def __init__(self, model, draws, as_of_date, regional=False, seed=None, error_model=None):
+        self.model = model
+        self.draws = draws
+        self.as_of_date = as_of_date
+        self.seed = seed
+        self.error_model = error_model
+        self.poll_averages, self.margin_of_error = model.poll_inputs(as_of_date)
+        self.baseline, self.riding_polls, self.regions = model.swing_inputs(self.poll_averages, as_of_date,
+                                                                            regional)
+
+    @classmethod
+    def from_model(cls, model, n_sims=10000, seed=None, as_of_date=None, error_model=None, regional=False,
+                   chunk_size=BATCH_SIZE):
+        """Draw and cache the errors of an `n_sims` run; the same seed matches ForecastModel.run() up to float32 rounding."""
+        as_of_date = as_of_date or date.today()
+        error_model = get_error_model(error_model)
+        draws, seed_seq = draw_errors(model.baseline, n_sims, chunk_size, seed, error_model)
+        return cls(model, draws, as_of_date, regional, seed_seq.entropy, error_model)
+
+    @classmethod
+    def load(cls, model, path, as_of_date=None, regional=False):
+        """Memory-map draws saved with save(); the forecast date and swing may differ from the saved run."""
+        path = Path(path)
+        meta = json.loads((path / DRAWS_META_FILE).read_text())
+        if not np.array_equal(meta['riding_ids'], model.baseline.riding_ids):
+            raise ValueError("Saved draws were made for different ridings")
+        if not isinstance(meta.get('error_model'), dict):
+            raise ValueError("Saved draws do not record their error model's options; save them again")
+        error_model = get_error_model(meta['error_model']['name'], **meta['error_model']['options'])
+        draws = np.load(path / DRAWS_FILE, mmap_mode='r')
+        return cls(model, draws, as_of_date or date.today(), regional, meta['seed'], error_model)
+
+    def save(self, path):
+        """Write the draws (float32 .npy) and their metadata to `path`."""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / DRAWS_FILE, np.ascontiguousarray(self.draws, dtype=np.float32))
+        meta = {
+            'seed': self.seed,
+            'error_model': {'name': self.error_model.name, 'options': self.error_model.options()},
+            'riding_ids': self.baseline.riding_ids.tolist(),
+        }
+        (path / DRAWS_META_FILE).write_text(json.dumps(meta, indent=1))
+
+    @property
+    def numsims(self):
+        return len(self.draws)
+
+    def evaluate(self, scenario=None, poll_averages=None):
+        """SampleStore for one scenario.
+
+        `scenario` shifts the polling averages by {party: points}, everywhere
+        the model's swing uses them; `poll_averages` instead replaces the
+        national averages outright ((P,) on the PARTIES axis).
+        """
+        riding_polls = self.riding_polls
+        if poll_averages is not None:
+            riding_polls = riding_polls + (np.asarray(poll_averages, dtype=float) - self.poll_averages)
+        if scenario:
+            riding_polls = riding_polls + scenario_shift(scenario)
+        seats, winners = simulate_winners(self.baseline, riding_polls, self.margin_of_error, self.draws)
+        meta = {'scenario': dict(scenario or {}), 'as_of_date': self.as_of_date.isoformat(), 'seed': self.seed}
+        return SampleStore(seats.astype(np.uint16), winners, PARTIES, self.baseline.riding_ids,
+                           self.baseline.provinces, meta)
+
+    def evaluate_many(self, scenarios):
+        """Evaluate a {name: scenario} dict (or a list of scenarios) on the same draws."""
+        if not isinstance(scenarios, dict):
+            scenarios = {format_scenario(s): s for s in scenarios}
+        return {name: self.evaluate(scenario) for name, scenario in scenarios.items()}
+
+
+def format_scenario(scenario):
+    return ','.join(f'{party}={points:+g}' for party, points in scenario.items()) or 'base'
+
+
+def parse_scenario(text):
+    """Parses a scenario given as "lpc=-3,cpc=+3" ("base" for no change)."""
+    if text == 'base':
+        return {}
+    scenario = {}
+    for item in text.split(','):
+        party, points = item.split('=')
+        scenario[party.strip().lower()] = float(points)
+    return scenario
+
+
+def scenario_summary(stores):
+    """One row per scenario: mean seats per party, then P(majority) and P(most seats) in percent.
+
+    Probability columns that are 0 in every scenario are left out.
+    """
+    rows = {}
+    for name, store in stores.items():
+        row = {party: store.seats[:, j].mean() for j, party in enumerate(store.parties)}
+        summary = store.summary()
+        for party in store.parties:
+            row[f'{party}_majority'] = summary.loc[party, 'majority'] * 100
+            row[f'{party}_most'] = summary.loc[party, 'most_seats'] * 100
+        rows[name] = row
+    summary = pd.DataFrame.from_dict(rows, orient='index').round(1)
+    probabilities = summary.columns[len(PARTIES):]
+    return summary.drop(columns=[c for c in probabilities if (summary[c] == 0).all()])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Evaluate what-if poll scenarios on one set of simulations')
+    parser.add_argument('scenarios', nargs='*', type=parse_scenario, default=[{}],
+                        help='poll shifts in points, e.g. lpc=-3,cpc=+3 ("base" for none)')
+    parser.add_argument('--baseline', default='current', help='riding baseline strategy')
+    parser.add_argument('--sims', type=int, default=10000, help='number of cached simulations')
+    parser.add_argument('--seed', type=int, default=None, help='seed for reproducible draws')
+    parser.add_argument('--as-of', type=date.fromisoformat, default=None, help='forecast date (YYYY-MM-DD, default today)')
+    parser.add_argument('--error-model', choices=sorted(ERROR_MODELS), default='independent', help='polling error model')
+    parser.add_argument('--regional', action='store_true', help='swing ridings with their region\'s polls')
+    args = parser.parse_args(argv)
+
+    model = ForecastModel.load(args.baseline)
+    what_if = WhatIf.from_model(model, args.sims, args.seed, args.as_of, args.error_model, args.regional)
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(scenario_summary(what_if.evaluate_many([{}] + [s for s in args.scenarios if s])))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# The scripts import each other as top-level modules, as when run directly
+for directory in ('election_model', 'election_database', 'election_map'):
+    sys.path.insert(0, str(PROJECT_ROOT / directory))
@@ -0,0 +1,20 @@
+"""
+Adaptive runs stop at the same point, with the same results, for any worker count.
+"""
+
+from datetime import date
+
+import numpy as np
+
+from forecast_model import ForecastModel
+
+
+def test_adaptive_result_does_not_depend_on_workers():
+    model = ForecastModel.load(use_cache=False)
+    runs = [model.run(n_sims=20000, seed=1, as_of_date=date(2026, 8, 20), chunk_size=250, workers=workers,
+                      adaptive=True, tolerance=1.5, seat_tolerance=0.5, min_sims=1000)
+            for workers in (1, 3)]
+
+    assert runs[0].numsims == runs[1].numsims > 1000
+    np.testing.assert_array_equal(runs[0].aggregates.win_counts, runs[1].aggregates.win_counts)
+    np.testing.assert_array_equal(runs[0].seats, runs[1].seats)
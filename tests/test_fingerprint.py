@@ -0,0 +1,42 @@
+"""
+Run fingerprints (run_manifest.py) change with every setting that changes
+the output, so --skip-if-unchanged never keeps results made differently.
+"""
+
+from datetime import date
+
+import pytest
+
+import election_model
+from forecast_model import ForecastModel
+
+AS_OF = date(2026, 8, 20)
+
+
+@pytest.fixture(scope='module')
+def model():
+    return ForecastModel.load(use_cache=False)
+
+
+def fingerprint(model, *argv):
+    args = election_model.build_parser().parse_args(['--seed', '1', *argv])
+    config = election_model.run_config(args, election_model.build_error_model(args), args.chunk_size)
+    return model.fingerprint(args.sims, args.seed, AS_OF, args.regional, **config)[0]
+
+
+def test_every_error_model_option_changes_the_fingerprint(model):
+    variants = [
+        [],
+        ['--sampler', 'antithetic'],
+        ['--error-model', 'correlated'],
+        ['--error-model', 'correlated', '--party-correlation', '0.3'],
+        ['--error-model', 'correlated', '--error-split', '0.5,0.3,0.2'],
+        ['--error-model', 'correlated', '--sampler', 'antithetic'],
+    ]
+    fingerprints = [fingerprint(model, *argv) for argv in variants]
+    assert len(set(fingerprints)) == len(variants)
+
+
+def test_same_options_same_fingerprint(model):
+    argv = ['--error-model', 'correlated', '--party-correlation', '0.3']
+    assert fingerprint(model, *argv) == fingerprint(model, *argv)
@@ -0,0 +1,73 @@
+"""
+create_geojson.py builds the map from the model_results of the last
+election_model.py run, whichever mode it ran in. The riding shapes are
+stand-in squares for a few ridings (the real boundaries are not in the repo).
+"""
+
+import json
+
+import pandas as pd
+import pytest
+
+import create_geojson
+import election_model
+import instrumentation
+
+AS_OF = '2026-08-20'
+
+MAPPED_RIDINGS = 3
+
+
+@pytest.fixture
+def results(tmp_path, monkeypatch):
+    results_dir = tmp_path / 'model_results'
+    monkeypatch.setattr(election_model, 'RESULTS_DIR', results_dir)
+    monkeypatch.setattr(create_geojson, 'RESULTS_DIR', results_dir)
+    monkeypatch.setattr(create_geojson, 'OUTPUT_PATH', tmp_path / 'election_forecast.geojson')
+    monkeypatch.setattr(create_geojson, 'STAMP_PATH', tmp_path / 'election_forecast.fingerprint')
+    monkeypatch.setattr(create_geojson, 'DISTRICTS_PATH', tmp_path / 'districts.geojson')
+    monkeypatch.setattr(instrumentation, 'REPORTS_DIR', tmp_path / 'run_reports')
+    return results_dir
+
+
+def write_districts(results):
+    """Square stand-ins for the first few ridings of the last run."""
+    riding_ids = pd.read_csv(results / 'ridingprobabilities.csv')['FED_NUM'][:MAPPED_RIDINGS]
+    features = [
+        {'type': 'Feature', 'properties': {'FED_NUM': str(fed_num)},
+         'geometry': {'type': 'Polygon', 'coordinates': [[[i, 0], [i + 1, 0], [i + 1, 1], [i, 1], [i, 0]]]}}
+        for i, fed_num in enumerate(riding_ids)
+    ]
+    create_geojson.DISTRICTS_PATH.write_text(json.dumps({'type': 'FeatureCollection', 'features': features}))
+    return riding_ids
+
+
+def run_model(results, *argv):
+    election_model.main(['--as-of', AS_OF, '--seed', '1', '--no-progress', '--no-baseline-cache',
+                         '--report', str(results.parent / 'run_reports' / 'election_model.json'), *argv])
+
+
+def test_map_after_analytic_run_explains_missing_vote_percents(results):
+    run_model(results, '--sims', '500')
+    run_model(results, '--analytic')
+    assert not (results / 'ridingvotepercents.csv').exists()
+
+    with pytest.raises(SystemExit) as exit_info:
+        create_geojson.main(['--force'])
+
+    assert 'ridingvotepercents.csv' in str(exit_info.value.code)
+    assert '--analytic' in str(exit_info.value.code)
+    assert not create_geojson.OUTPUT_PATH.exists()
+
+
+def test_map_after_simulation_run(results):
+    run_model(results, '--analytic')
+    run_model(results, '--sims', '500')
+    riding_ids = write_districts(results)
+
+    create_geojson.main([])
+
+    features = json.loads(create_geojson.OUTPUT_PATH.read_text())['features']
+    assert [f['properties']['FED_NUM'] for f in features] == riding_ids.tolist()
+    assert all(f['properties']['Fill'] != '#ffffff' and f['properties']['LPC'] > 0 for f in features)
+    assert create_geojson.STAMP_PATH.read_text().strip() == json.loads((results / 'run.json').read_text())['fingerprint']
@@ -0,0 +1,51 @@
+"""
+The regional swing compares regional polls with each region's share of the
+vote, weighting ridings by the votes cast in them.
+"""
+
+import sqlite3
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from forecast_engine import PARTIES
+from forecast_model import DB_PATH, ForecastModel
+from regions import PROVINCE_REGIONS
+
+
+@pytest.fixture(scope='module')
+def model():
+    return ForecastModel.load(use_cache=False)
+
+
+def regional_vote_share(region, party):
+    provinces = [p for p, r in PROVINCE_REGIONS.items() if r == region]
+    with sqlite3.connect(DB_PATH) as conn:
+        (share,) = conn.execute(
+            f"""
+            SELECT 100.0 * SUM(CASE WHEN r.party = ? THEN r.votecount ELSE 0 END) / SUM(r.votecount)
+            FROM riding_results AS r JOIN ridings AS d ON d.id = r.id
+            WHERE r.year = 2025 AND d.province IN ({', '.join('?' * len(provinces))})
+            """,
+            (party, *provinces),
+        ).fetchone()
+    return share
+
+
+def test_reference_shares_are_regional_vote_shares(model):
+    regional = model.regional_polls
+    reference = regional.reference_shares(model.baseline)
+    for g, region in enumerate(regional.regions):
+        for party in ('lpc', 'cpc', 'ndp'):
+            # Riding shares are stored rounded to 0.1
+            assert reference[g, PARTIES.index(party)] == pytest.approx(regional_vote_share(region, party), abs=0.05)
+
+
+def test_without_votes_every_riding_counts_equally(model):
+    baseline = replace(model.baseline, votes=None)
+    regional = model.regional_polls
+    ontario = regional.regions.index('Ontario')
+    in_region = regional.riding_region == ontario
+    np.testing.assert_allclose(regional.reference_shares(baseline)[ontario],
+                               baseline.shares[in_region].mean(axis=0))
@@ -0,0 +1,38 @@
+"""
+A what-if base scenario matches ForecastModel.run() with the same seed, up to
+the float32 rounding of the cached draws (see scenarios.py).
+"""
+
+from datetime import date
+
+import numpy as np
+import pytest
+
+from forecast_engine import riding_win_counts
+from forecast_model import ForecastModel
+from scenarios import WhatIf
+
+AS_OF = date(2026, 8, 20)
+NUMSIMS = 5000
+
+# The stated tolerance: win probabilities within 0.1 points, and near-ties
+# flipping a riding in at most 0.1% of simulations
+MAX_WIN_PROBABILITY_DIFF_PP = 0.1
+MAX_CHANGED_SIMS = NUMSIMS // 1000
+
+
+@pytest.fixture(scope='module')
+def model():
+    return ForecastModel.load(use_cache=False)
+
+
+@pytest.mark.parametrize('error_model', ['independent', 'correlated'])
+def test_base_scenario_matches_run(model, error_model):
+    result = model.run(n_sims=NUMSIMS, seed=7, as_of_date=AS_OF, error_model=error_model)
+    store = WhatIf.from_model(model, NUMSIMS, seed=7, as_of_date=AS_OF, error_model=error_model).evaluate()
+
+    win_counts = riding_win_counts(store.winners)
+    diff_pp = np.abs(win_counts - result.aggregates.win_counts) / NUMSIMS * 100
+    assert diff_pp.max() <= MAX_WIN_PROBABILITY_DIFF_PP
+    changed_sims = (store.seats.astype(int) != result.seats).any(axis=1).sum()
+    assert changed_sims <= MAX_CHANGED_SIMS
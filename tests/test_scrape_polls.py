@@ -0,0 +1,206 @@
+"""
+Runs scrape_polls.py against a local stand-in for 338canada.com that serves
+recorded pages (tests/data/*.htm) with ETag and Last-Modified headers, on a
+temporary copy of election_database.db.
+"""
+
+import hashlib
+import json
+import shutil
+import sqlite3
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+import instrumentation
+import scrape_polls
+
+DATA_DIR = Path(__file__).parent / 'data'
+
+# Polls on polls.htm: three national (plus the election row) and one Quebec
+RECORDED_POLLS = 4
+
+
+class PollsPage:
+    """The page the stand-in server serves, and the requests it has answered."""
+
+    def __init__(self):
+        self.body = b''
+        self.etag = None
+        self.last_modified = None
+        self.requests = []
+
+    def serve(self, name, modified=1760500000):
+        self.body = (DATA_DIR / name).read_bytes()
+        self.etag = '"%s"' % hashlib.sha256(self.body).hexdigest()[:16]
+        self.last_modified = formatdate(modified, usegmt=True)
+
+
+@pytest.fixture
+def page():
+    page = PollsPage()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            not_modified = self.headers.get('If-None-Match') == page.etag
+            page.requests.append((dict(self.headers), 304 if not_modified else 200))
+            if not_modified:
+                self.send_response(304)
+                self.send_header('ETag', page.etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(page.body)))
+            self.send_header('ETag', page.etag)
+            self.send_header('Last-Modified', page.last_modified)
+            self.end_headers()
+            self.wfile.write(page.body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    page.url = 'http://127.0.0.1:%d/polls.htm' % server.server_address[1]
+    yield page
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    path = tmp_path / 'election_database.db'
+    shutil.copy(scrape_polls.DB_PATH, path)
+    monkeypatch.setattr(scrape_polls, 'DB_PATH', path)
+    monkeypatch.setattr(instrumentation, 'REPORTS_DIR', tmp_path / 'run_reports')
+    return path
+
+
+def run(page, *args):
+    """Run the scraper against the stand-in server; returns its run report."""
+    scrape_polls.main(['--url', page.url, *args])
+    return json.loads((instrumentation.REPORTS_DIR / 'scrape_polls.json').read_text())
+
+
+def count_polls(db):
+    with sqlite3.connect(db) as conn:
+        return conn.execute("SELECT COUNT(*) FROM polls").fetchone()[0]
+
+
+def saved_state(db, url):
+    with sqlite3.connect(db) as conn:
+        return conn.execute("SELECT etag, last_modified, payload_sha256, fetched FROM scrape_state WHERE url = ?",
+                            (url,)).fetchone()
+
+
+def test_first_fetch_inserts_every_region(page, db):
+    page.serve('polls.htm')
+    before = count_polls(db)
+
+    report = run(page)
+
+    assert report['status'] == 'ok'
+    assert report['details']['inserted'] == RECORDED_POLLS
+    assert report['details']['regions'] == {'National': 4, 'Québec': 1}
+    assert count_polls(db) == before + RECORDED_POLLS
+    with sqlite3.connect(db) as conn:
+        quebec = conn.execute("SELECT bq, lpc, cpc, ndp, gpc, sample FROM polls "
+                              "WHERE region = 'Québec' AND lastdate = '2026-10-12'").fetchone()
+    assert quebec == (30.0, 40.0, 18.0, 8.0, 3.0, 402)
+    etag, last_modified, _, _ = saved_state(db, page.url)
+    assert (etag, last_modified) == (page.etag, page.last_modified)
+
+
+def test_not_modified_short_circuits(page, db):
+    page.serve('polls.htm')
+    run(page)
+    before = count_polls(db)
+
+    report = run(page)
+
+    headers, status = page.requests[-1]
+    assert headers['If-None-Match'] == page.etag
+    assert headers['If-Modified-Since'] == page.last_modified
+    assert status == 304
+    assert report['status'] == 'unchanged'
+    assert [stage['name'] for stage in report['stages']] == ['fetch']
+    assert count_polls(db) == before
+
+
+def test_unchanged_payload_short_circuits(page, db):
+    page.serve('polls.htm')
+    run(page)
+    state = saved_state(db, page.url)
+
+    # Same poll data in a page that has otherwise changed
+    page.serve('polls_restamped.htm', modified=1760600000)
+    report = run(page)
+
+    assert page.requests[-1][1] == 200
+    assert report['status'] == 'unchanged'
+    assert 'insert' not in [stage['name'] for stage in report['stages']]
+    assert saved_state(db, page.url) == state
+
+
+def test_changed_page_inserts_only_new_polls(page, db):
+    page.serve('polls.htm')
+    run(page)
+    before = count_polls(db)
+
+    page.serve('polls_new_poll.htm', modified=1760700000)
+    report = run(page)
+
+    assert report['status'] == 'ok'
+    assert report['details']['inserted'] == 1
+    assert report['details']['skipped'] == RECORDED_POLLS + 1  # the election row too
+    assert count_polls(db) == before + 1
+    assert saved_state(db, page.url)[0] == page.etag
+
+
+def test_force_ignores_saved_state(page, db):
+    page.serve('polls.htm')
+    run(page)
+
+    report = run(page, '--force')
+
+    headers, status = page.requests[-1]
+    assert 'If-None-Match' not in headers and 'If-Modified-Since' not in headers
+    assert status == 200
+    assert report['status'] == 'ok'
+    assert report['details']['inserted'] == 0
+
+
+def test_force_on_fresh_database(page, db):
+    page.serve('polls.htm')
+    before = count_polls(db)
+
+    report = run(page, '--force')
+
+    assert report['status'] == 'ok'
+    assert report['details']['inserted'] == RECORDED_POLLS
+    assert count_polls(db) == before + RECORDED_POLLS
+    assert saved_state(db, page.url)[0] == page.etag
+
+
+def test_bad_row_does_not_save_state(page, db):
+    page.serve('polls_bad_row.htm')
+    before = count_polls(db)
+
+    with pytest.raises(SystemExit) as exit_info:
+        run(page)
+
+    assert exit_info.value.code == 1
+    report = json.loads((instrumentation.REPORTS_DIR / 'scrape_polls.json').read_text())
+    assert report['details']['errors'] == 1
+    assert count_polls(db) == before + RECORDED_POLLS
+    assert saved_state(db, page.url) is None
+
+    # The next run fetches the page again instead of treating it as unchanged
+    with pytest.raises(SystemExit):
+        run(page)
+    assert 'If-None-Match' not in page.requests[-1][0]